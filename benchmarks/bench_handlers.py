@@ -0,0 +1,286 @@
+"""Микробенчмарки обработчиков горячего пути теста.
+
+Обработчики (handle_answer, send_question, finish_test, show_leaderboard,
+show_test_catalog) вызываются напрямую с настоящими объектами Update и
+CallbackContext PTB; запросы к Bot API уходят в подменный FakeBotAPI, база -
+временный файл SQLite, заполненный до заданных размеров. Для каждого
+обработчика выводятся задержка (p50/p95), число SQL-запросов на вызов и
+пик выделенной памяти (tracemalloc, отдельный проход, чтобы трассировка не
+искажала время). Запуск из корня репозитория, без сети:
+
+    python benchmarks/bench_handlers.py
+    python benchmarks/bench_handlers.py --questions-per-level 1000 --users 100000 --custom-tests 5000
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+LEVELS = ("junior", "middle", "senior")
+LANGUAGES = ("python", "java", "sql")
+QUESTIONS_PER_TEST = 10
+CUSTOM_TEST_QUESTIONS = 5
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50, help="тестов на каждый проход")
+    parser.add_argument(
+        "--questions-per-level",
+        type=int,
+        default=0,
+        help="дополнить каждый уровень синтетическими вопросами до этого числа",
+    )
+    parser.add_argument("--users", type=int, default=10000, help="строк user_stats")
+    parser.add_argument("--custom-tests", type=int, default=500)
+    return parser.parse_args()
+
+
+def fill_database(args):
+    """Банк вопросов из data/questions плюс синтетические данные нужного объема"""
+    from sqlalchemy import func, insert, select
+
+    from database import create_tables, get_db, CustomQuestion, CustomTest, Question, UserStats
+    from seed import seed_question_bank
+
+    create_tables()
+    with contextlib.redirect_stdout(io.StringIO()):
+        seed_question_bank()
+
+    with get_db() as db:
+        counts = dict(
+            db.execute(select(Question.level, func.count()).group_by(Question.level)).all()
+        )
+        rows = [
+            {
+                "level": f"{level}_{lang}",
+                "question_text": f"Синтетический вопрос {i} ({level}, {lang})",
+                "option1": "A",
+                "option2": "B",
+                "option3": "C",
+                "option4": "D",
+                "correct_option": i % 4 + 1,
+            }
+            for lang in LANGUAGES
+            for level in LEVELS
+            for i in range(counts.get(f"{level}_{lang}", 0), args.questions_per_level)
+        ]
+        if rows:
+            db.execute(insert(Question), rows)
+
+        if args.users:
+            db.execute(
+                insert(UserStats),
+                [
+                    {
+                        "user_id": 10_000_000 + i,
+                        "username": f"user{i}",
+                        **{
+                            f"mmr_{lang}": random.randint(0, 3000) for lang in LANGUAGES
+                        },
+                        **{
+                            f"total_tests_{lang}": random.randint(0, 20)
+                            for lang in LANGUAGES
+                        },
+                    }
+                    for i in range(args.users)
+                ],
+            )
+
+        for i in range(args.custom_tests):
+            db.add(
+                CustomTest(
+                    name=f"Тест {i}",
+                    author_id=20_000_000 + i % 1000,
+                    author_username=f"author{i % 1000}",
+                    questions=[
+                        CustomQuestion(
+                            question_text=f"Вопрос {j}",
+                            option1="a",
+                            option2="b",
+                            option3="c",
+                            option4="d",
+                            correct_option=j % 4 + 1,
+                        )
+                        for j in range(CUSTOM_TEST_QUESTIONS)
+                    ],
+                )
+            )
+        db.commit()
+
+
+class QueryCounter:
+    """Считает SQL-запросы, выполненные через engine"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+
+class HandlerBench:
+    def __init__(self, application, queries):
+        from fake_bot_api import UpdateFactory
+
+        self.application = application
+        self.queries = queries
+        self.factory = UpdateFactory()
+        self.times = defaultdict(list)
+        self.query_counts = defaultdict(list)
+        self.peaks = defaultdict(list)
+        self.trace_memory = False
+        self._user_ids = iter(range(1, 10_000_000))
+
+    def make_call(self, user_id, data):
+        """Update с нажатием кнопки и контекст для прямого вызова обработчика"""
+        from telegram import Update
+        from telegram.ext import CallbackContext
+
+        update = Update.de_json(self.factory.callback(user_id, data), self.application.bot)
+        return update, CallbackContext.from_update(update, self.application)
+
+    async def measure(self, name, awaitable_factory):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            start = tracemalloc.get_traced_memory()[0]
+            await awaitable_factory()
+            self.peaks[name].append(tracemalloc.get_traced_memory()[1] - start)
+            return
+        queries = self.queries.count
+        started = time.perf_counter()
+        await awaitable_factory()
+        self.times[name].append(time.perf_counter() - started)
+        self.query_counts[name].append(self.queries.count - queries)
+
+    async def standard_test(self):
+        """Один тест: выбор уровня (не замеряется), send_question, ответы"""
+        import bot
+        from session_store import active_sessions
+
+        user_id = next(self._user_ids)
+        level_key = f"{random.choice(LEVELS)}_{random.choice(LANGUAGES)}"
+        level, lang = level_key.split("_")
+        await bot.handle_level_selection(*self.make_call(user_id, f"level_{lang}_{level}"))
+        session = await active_sessions.get(user_id)
+
+        _, context = self.make_call(user_id, "noop")
+        question = bot.question_bank.get(session.current_question_id)
+        await self.measure(
+            "send_question",
+            lambda: bot.send_question(context, user_id, question, session),
+        )
+        for position in range(QUESTIONS_PER_TEST):
+            name = "handle_answer" if position < QUESTIONS_PER_TEST - 1 else "handle_answer (последний)"
+            call = self.make_call(user_id, f"answer_{position}_{random.randint(1, 4)}")
+            await self.measure(name, lambda: bot.handle_answer(*call))
+
+        async def finish():
+            async with bot.get_async_db() as db:
+                result = await bot.finish_test(db, user_id, level_key, 7)
+                await db.commit()
+            bot.update_leaderboard(user_id, result)
+
+        await self.measure("finish_test", finish)
+
+    async def browsing(self):
+        import bot
+        import custom_tests
+
+        user_id = next(self._user_ids)
+        update, context = self.make_call(user_id, "leaderboard")
+        context.user_data["leaderboard_language"] = random.choice(LANGUAGES)
+        await self.measure("show_leaderboard", lambda: bot.show_leaderboard(update, context))
+
+        pages = max(1, -(-len(custom_tests.custom_tests_storage) // custom_tests.TESTS_PER_PAGE))
+        call = self.make_call(user_id, f"test_catalog_{random.randrange(pages)}")
+        await self.measure("show_test_catalog", lambda: custom_tests.show_test_catalog(*call))
+
+    async def run(self, iterations):
+        for _ in range(iterations):
+            await self.standard_test()
+            await self.browsing()
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def report(bench):
+    print(
+        f"{'обработчик':<28}{'вызовов':>8}{'p50, мс':>10}{'p95, мс':>10}"
+        f"{'запросов':>10}{'пик, КиБ':>10}"
+    )
+    for name, values in bench.times.items():
+        queries = statistics.mean(bench.query_counts[name])
+        peak = statistics.median(bench.peaks[name]) / 1024 if bench.peaks[name] else 0
+        print(
+            f"{name:<28}{len(values):>8}{statistics.median(values) * 1000:>10.2f}"
+            f"{percentile(values, 0.95) * 1000:>10.2f}{queries:>10.1f}{peak:>10.1f}"
+        )
+
+
+async def run_bench(args):
+    import bot
+    import database
+    from fake_bot_api import FakeBotAPI
+
+    logging.getLogger().setLevel(logging.WARNING)
+    bot.question_bank.load()
+    bot.leaderboard.load()
+
+    application = bot.build_application(request=FakeBotAPI())
+    bench = HandlerBench(application, QueryCounter(database.async_engine.sync_engine))
+    async with application:
+        # Прогрев: соединения пула, кэши текстов и подготовленные выражения
+        await bench.run(5)
+        bench.times.clear()
+        bench.query_counts.clear()
+
+        await bench.run(args.iterations)
+
+        bench.trace_memory = True
+        tracemalloc.start()
+        await bench.run(max(1, args.iterations // 5))
+        tracemalloc.stop()
+
+    print(
+        f"вопросов в банке: {len(bot.question_bank)}, user_stats: {args.users}, "
+        f"пользовательских тестов: {args.custom_tests}\n"
+    )
+    report(bench)
+
+
+def main():
+    args = parse_args()
+    os.environ.setdefault("BOT_TOKEN", "1:bench")
+    # Лимиты отправки здесь не замеряются
+    for name in ("BOT_API_GLOBAL_RATE", "BOT_API_CHAT_RATE", "BOT_API_CHAT_BURST"):
+        os.environ[name] = "1000000"
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.environ["DB_PATH"] = os.path.join(tmp_dir, "bench.db")
+        # Как и в main.py, bot импортируется только после заполнения базы
+        fill_database(args)
+        asyncio.run(run_bench(args))
+
+
+if __name__ == "__main__":
+    main()
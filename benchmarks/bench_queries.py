@@ -0,0 +1,291 @@
+"""Задержка запросов бота к БД в зависимости от объема данных.
+
+Для каждого размера (число пользователей, остальные таблицы растут
+пропорционально, см. generate_dataset.scaled_sizes) создается синтетическая
+база, и на ее копии в отдельном процессе (модули бота привязываются к
+DB_PATH при импорте) замеряются все запросы, которые выполняет бот: загрузка
+кэшей при старте, запросы обработчиков и обслуживание. Результат - таблица
+"запрос x размер" с медианой в миллисекундах, по которой можно сравнивать
+индексы и изменения схемы. Запуск из корня репозитория:
+
+    python benchmarks/bench_queries.py --sizes 10000 100000 1000000 --data-dir /tmp/quiz-datasets
+
+С --data-dir сгенерированные базы сохраняются и переиспользуются.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+# Сколько активных тестов записывается за один flush в замере
+FLUSH_BATCH = 100
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=50, help="повторов каждого запроса")
+    parser.add_argument("--data-dir", help="каталог для сгенерированных баз")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+# --- Замеры (выполняются в дочернем процессе с DB_PATH=<копия базы>) ---
+
+
+class Timings:
+    def __init__(self):
+        self.results = {}
+
+    def add(self, name, seconds):
+        self.results.setdefault(name, []).append(seconds)
+
+    def measure_sync(self, name, function, runs):
+        for _ in range(runs):
+            started = time.perf_counter()
+            function()
+            self.add(name, time.perf_counter() - started)
+
+    async def measure(self, name, factory, runs):
+        for _ in range(runs):
+            call = factory()
+            started = time.perf_counter()
+            await call
+            self.add(name, time.perf_counter() - started)
+
+    def medians(self):
+        return {name: statistics.median(values) for name, values in self.results.items()}
+
+
+async def run_worker(repeat):
+    from sqlalchemy import delete, func, insert, select
+
+    from database import (
+        AsyncSessionLocal,
+        SessionQuestion,
+        UserProgress,
+        UserStats,
+        apply_mmr_result,
+        ensure_user_stats,
+        write_transaction,
+    )
+    from generate_dataset import LEVELS
+    from leaderboard import leaderboard
+    from maintenance import prune_finished_progress
+    from question_bank import question_bank
+    from session_store import active_sessions
+    import custom_tests
+
+    timings = Timings()
+    # Загрузки при старте медленные на больших базах, их хватает одного раза
+    startup_runs = 1
+
+    # Загрузка кэшей при старте (синхронно)
+    timings.measure_sync("question_bank.load", question_bank.load, startup_runs)
+    timings.measure_sync("leaderboard.load", leaderboard.load, startup_runs)
+    timings.measure_sync("load_custom_tests", custom_tests.load_custom_tests, startup_runs)
+
+    async with AsyncSessionLocal() as db:
+        max_user_id = await db.scalar(select(func.max(UserStats.user_id)))
+        active_users = (
+            await db.scalars(
+                select(UserProgress.user_id).where(UserProgress.is_testing == True)  # noqa: E712
+            )
+        ).all()
+        active_progress = (
+            await db.scalars(
+                select(UserProgress.id).where(UserProgress.is_testing == True)  # noqa: E712
+            )
+        ).all()
+
+    def random_user():
+        return random.randint(1, max_user_id)
+
+    async def in_transaction(work):
+        async with AsyncSessionLocal() as db:
+            await work(db)
+            await db.commit()
+
+    async def level_selection(db):
+        # Те же запросы, что в handle_level_selection
+        user_id = random_user()
+        level = random.choice(LEVELS)
+        question_ids = question_bank.sample(level, 10)
+        previous_id, stored_username = (
+            await db.execute(
+                select(
+                    select(UserProgress.id)
+                    .where(UserProgress.user_id == user_id)
+                    .scalar_subquery(),
+                    select(UserStats.username)
+                    .where(UserStats.user_id == user_id)
+                    .scalar_subquery(),
+                )
+            )
+        ).one()
+        async with write_transaction(db):
+            if previous_id is not None:
+                await db.execute(
+                    delete(SessionQuestion).where(SessionQuestion.session_id == previous_id)
+                )
+                await db.execute(delete(UserProgress).where(UserProgress.id == previous_id))
+            progress = UserProgress(user_id=user_id, level=level, is_testing=True)
+            db.add(progress)
+            await db.flush()
+            await db.execute(
+                insert(SessionQuestion),
+                [
+                    {"session_id": progress.id, "position": position, "question_id": question_id}
+                    for position, question_id in enumerate(question_ids)
+                ],
+            )
+            if stored_username != f"user{user_id}":
+                await ensure_user_stats(db, user_id, f"user{user_id}")
+
+    async def load_session():
+        user_id = random.choice(active_users)
+        active_sessions.discard(user_id)
+        await active_sessions.get(user_id)
+        active_sessions.discard(user_id)
+
+    async def flush(db):
+        progress_ids = random.sample(active_progress, min(FLUSH_BATCH, len(active_progress)))
+        rows = [
+            {
+                "b_id": progress_id,
+                "b_current_question": 5,
+                "b_correct_answers": 3,
+                "b_last_answer_time": None,
+                "b_is_testing": True,
+            }
+            for progress_id in progress_ids
+        ]
+        answers = [
+            {
+                "b_session_id": progress_id,
+                "b_position": position,
+                "b_chosen_option": 1,
+                "b_is_correct": True,
+                "b_answered_at": None,
+            }
+            for progress_id in progress_ids
+            for position in range(5)
+        ]
+        await active_sessions._write(db, rows, answers)
+
+    async def finish(db):
+        lang = random.choice(("python", "java", "sql"))
+        await apply_mmr_result(
+            db,
+            random_user(),
+            getattr(UserStats, f"mmr_{lang}"),
+            getattr(UserStats, f"total_tests_{lang}"),
+            UserStats.mmr_change_expression(
+                UserStats.base_mmr_change(7, f"middle_{lang}"), -100, 150
+            ),
+        )
+
+    async def save_author_tests():
+        # finish_test_creation передает все хранилище; здесь - тесты одного автора
+        author_id, tests = random.choice(list(custom_tests.custom_tests_storage.items()))
+        await custom_tests.save_custom_tests({author_id: tests})
+
+    timings.measure_sync(
+        "question_bank.sample",
+        lambda: question_bank.sample(random.choice(LEVELS), 10),
+        repeat,
+    )
+    await timings.measure(
+        "ensure_user_stats",
+        lambda: in_transaction(
+            lambda db: ensure_user_stats(db, random_user(), "bench")
+        ),
+        repeat,
+    )
+    await timings.measure(
+        "handle_level_selection (БД)", lambda: in_transaction(level_selection), repeat
+    )
+    await timings.measure("active_sessions.get (из БД)", load_session, repeat)
+    await timings.measure(
+        f"flush ({FLUSH_BATCH} тестов)", lambda: in_transaction(flush), repeat
+    )
+    await timings.measure("apply_mmr_result", lambda: in_transaction(finish), repeat)
+    await timings.measure("save_custom_tests (1 автор)", save_author_tests, repeat)
+    await timings.measure(
+        "prune_finished_progress", lambda: prune_finished_progress(retention_days=30), 1
+    )
+    return timings.medians()
+
+
+# --- Родительский процесс: базы разных размеров и итоговая таблица ---
+
+
+def dataset_path(data_dir, users):
+    from generate_dataset import generate_dataset, scaled_sizes
+
+    path = os.path.join(data_dir, f"quiz_{users}.db")
+    if not os.path.exists(path):
+        started = time.perf_counter()
+        generate_dataset(path, **scaled_sizes(users))
+        print(
+            f"база на {users} пользователей создана за {time.perf_counter() - started:.1f} с",
+            file=sys.stderr,
+        )
+    return path
+
+
+def run_size(data_dir, users, repeat):
+    source = dataset_path(data_dir, users)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Замеры меняют данные, поэтому работают с копией
+        path = os.path.join(tmp_dir, "quiz.db")
+        shutil.copyfile(source, path)
+        env = dict(os.environ, DB_PATH=path, BOT_TOKEN=os.getenv("BOT_TOKEN", "1:bench"))
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", str(repeat)],
+            env=env,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def report(results):
+    sizes = list(results)
+    queries = list(results[sizes[0]])
+    print(f"{'запрос, мс':<32}" + "".join(f"{size:>12}" for size in sizes))
+    for query in queries:
+        print(
+            f"{query:<32}"
+            + "".join(f"{results[size].get(query, 0) * 1000:>12.2f}" for size in sizes)
+        )
+
+
+def main():
+    args = parse_args()
+    if args.worker:
+        print(json.dumps(asyncio.run(run_worker(int(args.worker)))))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_dir = args.data_dir or tmp_dir
+        os.makedirs(data_dir, exist_ok=True)
+        results = {users: run_size(data_dir, users, args.repeat) for users in args.sizes}
+    report(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Стоимость подготовки сообщения с вопросом: без кэша и с кэшем rendering.py.
+
+"Без кэша" повторяет прежний код send_question/handle_answer: f-строка
+вопроса, новая InlineKeyboardMarkup на каждую отправку и повторное
+форматирование вопроса для ответа. Запуск из корня репозитория:
+
+    python benchmarks/bench_render.py --iterations 20000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from question_bank import QuestionRecord
+from rendering import answer_feedback, answer_keyboard, question_message
+
+TOTAL = 10
+
+
+def make_questions(count):
+    return [
+        QuestionRecord(
+            id=i,
+            level="junior_python",
+            question_text=f"Вопрос номер {i}: что выведет этот фрагмент кода?",
+            option1=f"Вариант A{i}",
+            option2=f"Вариант B{i}",
+            option3=f"Вариант C{i}",
+            option4=f"Вариант D{i}",
+            correct_option=i % 4 + 1,
+        )
+        for i in range(count)
+    ]
+
+
+def render_uncached(question, position, selected_option):
+    text = (
+        f"❓ Вопрос {position + 1}/{TOTAL}:\n\n"
+        f"{question.question_text}\n\n"
+        f"Варианты ответов:\n"
+        f"1️⃣ {question.option1}\n"
+        f"2️⃣ {question.option2}\n"
+        f"3️⃣ {question.option3}\n"
+        f"4️⃣ {question.option4}"
+    )
+    markup = InlineKeyboardMarkup(
+        [
+            [
+                InlineKeyboardButton("1️⃣", callback_data="answer_1"),
+                InlineKeyboardButton("2️⃣", callback_data="answer_2"),
+                InlineKeyboardButton("3️⃣", callback_data="answer_3"),
+                InlineKeyboardButton("4️⃣", callback_data="answer_4"),
+            ],
+            [InlineKeyboardButton("❌ Отменить тест", callback_data="cancel_standard_test")],
+        ]
+    )
+    # Ответ: вопрос форматируется еще раз
+    again = (
+        f"❓ Вопрос {position + 1}/{TOTAL}:\n\n"
+        f"{question.question_text}\n\n"
+        f"Варианты ответов:\n"
+        f"1️⃣ {question.option1}\n"
+        f"2️⃣ {question.option2}\n"
+        f"3️⃣ {question.option3}\n"
+        f"4️⃣ {question.option4}"
+    )
+    selected = getattr(question, f"option{selected_option}")
+    correct = getattr(question, f"option{question.correct_option}")
+    if selected_option == question.correct_option:
+        feedback = f"{again}\n\n✅ Правильно!\n\nВаш ответ: {selected}"
+    else:
+        feedback = (
+            f"{again}\n\n❌ Неправильно!\n\n"
+            f"Ваш ответ: {selected}\nПравильный ответ: {correct}"
+        )
+    return text, markup, feedback
+
+
+def render_cached(question, position, selected_option):
+    return (
+        question_message(question, position, TOTAL),
+        answer_keyboard(position),
+        answer_feedback(question, position, TOTAL, selected_option),
+    )
+
+
+def measure(render, questions, iterations):
+    """Среднее время одного вопроса (отправка + ответ) в микросекундах"""
+    count = len(questions)
+    started = time.perf_counter()
+    for i in range(iterations):
+        render(questions[i % count], i % TOTAL, i % 4 + 1)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--questions", type=int, default=150)
+    args = parser.parse_args()
+
+    questions = make_questions(args.questions)
+    # Прогрев кэша: в работающем боте все вопросы быстро попадают в кэш
+    measure(render_cached, questions, args.questions * TOTAL * 4)
+
+    print(f"{'вариант':<12}{'мкс на вопрос':>16}")
+    for name, render in (("без кэша", render_uncached), ("с кэшем", render_cached)):
+        print(f"{name:<12}{measure(render, questions, args.iterations):>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
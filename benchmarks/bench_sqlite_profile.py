@@ -0,0 +1,90 @@
+"""Сравнение профилей SQLite: коммиты в секунду на записи ответа.
+
+Каждый поток имитирует handle_answer: обновляет строку user_progress
+и делает commit. Запуск из корня репозитория:
+
+    python benchmarks/bench_sqlite_profile.py --writers 1 4 8 --commits 300
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, SQLITE_PROFILES, UserProgress, make_engine
+
+
+def run_profile(profile, writers, commits_per_writer):
+    """Возвращает (коммитов в секунду, число ошибок блокировки)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(os.path.join(tmp, "bench.db"), profile)
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+        with Session() as db:
+            db.add_all(
+                UserProgress(user_id=user_id, level="junior_python", is_testing=True)
+                for user_id in range(writers)
+            )
+            db.commit()
+
+        errors = []
+
+        def writer(user_id):
+            with Session() as db:
+                progress = (
+                    db.query(UserProgress)
+                    .filter(UserProgress.user_id == user_id)
+                    .first()
+                )
+                for _ in range(commits_per_writer):
+                    progress.current_question += 1
+                    progress.correct_answers += 1
+                    progress.last_answer_time = datetime.utcnow()
+                    try:
+                        db.commit()
+                    except OperationalError:
+                        db.rollback()
+                        errors.append(user_id)
+
+        threads = [
+            threading.Thread(target=writer, args=(user_id,))
+            for user_id in range(writers)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        engine.dispose()
+
+    done = writers * commits_per_writer - len(errors)
+    return done / elapsed, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--commits", type=int, default=300)
+    parser.add_argument(
+        "--profiles", nargs="+", default=list(SQLITE_PROFILES), choices=SQLITE_PROFILES
+    )
+    args = parser.parse_args()
+
+    print(f"{'профиль':<10}{'писателей':>10}{'коммитов/с':>14}{'locked':>8}")
+    for profile in args.profiles:
+        for writers in args.writers:
+            rate, errors = run_profile(profile, writers, args.commits)
+            print(f"{profile:<10}{writers:>10}{rate:>14.0f}{errors:>8}")
+
+
+if __name__ == "__main__":
+    main()
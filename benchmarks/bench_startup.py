@@ -0,0 +1,79 @@
+"""Время старта main.py до запуска бота: импорт, создание таблиц, заполнение вопросов.
+
+Каждый замер - отдельный процесс Python на заранее заполненной временной
+базе, то есть повторный запуск бота, когда вопросы уже в БД. Запуск из
+корня репозитория:
+
+    python benchmarks/bench_startup.py --runs 15
+    python benchmarks/bench_startup.py --no-bytecode   # без кэша __pycache__
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Повторяет шаги main.py до импорта bot
+STARTUP = """
+import time
+started = time.perf_counter()
+from database import create_tables
+from seed import seed_question_bank
+imported = time.perf_counter()
+create_tables()
+seed_question_bank()
+done = time.perf_counter()
+print(imported - started, done - imported)
+"""
+
+
+def run_once(env):
+    """Возвращает (весь процесс, импорт, таблицы и вопросы) в секундах"""
+    started = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", STARTUP],
+        env=env,
+        cwd=env["BENCH_DIR"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    total = time.perf_counter() - started
+    imported, seeded = map(float, out.strip().splitlines()[-1].split())
+    return total, imported, seeded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=15)
+    parser.add_argument("--no-bytecode", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            BENCH_DIR=tmp,
+            DB_PATH=os.path.join(tmp, "bench.db"),
+            PYTHONPATH=ROOT,
+        )
+        if args.no_bytecode:
+            env["PYTHONDONTWRITEBYTECODE"] = "1"
+        # Первый запуск заполняет базу, в замеры не входит
+        run_once(env)
+        results = [run_once(env) for _ in range(args.runs)]
+
+    print(f"{'этап':<20}{'медиана, мс':>14}{'мин, мс':>10}")
+    for name, values in zip(("процесс целиком", "импорт", "таблицы и вопросы"), zip(*results)):
+        print(
+            f"{name:<20}{statistics.median(values) * 1000:>14.1f}"
+            f"{min(values) * 1000:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
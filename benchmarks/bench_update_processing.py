@@ -0,0 +1,91 @@
+"""Пропускная способность и порядок обработки обновлений.
+
+Обновления раздаются так же, как это делает Application при
+concurrent_updates: задача на каждое обновление в порядке получения.
+Обработчик имитирует ответ на вопрос: случайная задержка (сеть, БД) и
+запись номера ответа. Сравниваются последовательная обработка,
+параллельная без блокировок (SimpleUpdateProcessor) и PerUserUpdateProcessor;
+для каждого варианта проверяется, что ответы каждого пользователя
+применились в порядке отправки. Запуск из корня репозитория:
+
+    python benchmarks/bench_update_processing.py --users 1 10 50 --answers 10
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import CallbackQuery, Update, User
+from telegram.ext import SimpleUpdateProcessor
+
+from update_processing import MAX_CONCURRENT_UPDATES, PerUserUpdateProcessor
+
+
+def make_updates(users, answers):
+    """Ответы пользователей вперемешку, как они приходят от Telegram"""
+    updates = []
+    update_id = 0
+    for position in range(answers):
+        for user_id in range(1, users + 1):
+            update_id += 1
+            query = CallbackQuery(
+                id=str(update_id),
+                from_user=User(user_id, f"user{user_id}", False),
+                chat_instance=str(user_id),
+                data=f"answer_{position}",
+            )
+            updates.append(Update(update_id, callback_query=query))
+    return updates
+
+
+async def run(processor, updates, delay_ms):
+    """Возвращает (обновлений в секунду, пользователей с нарушенным порядком)"""
+    applied = {}
+    rng = random.Random(1)
+    delays = [rng.uniform(0, 2 * delay_ms) / 1000 for _ in updates]
+
+    async def handler(update, delay):
+        await asyncio.sleep(delay)
+        position = int(update.callback_query.data.split("_")[1])
+        applied.setdefault(update.effective_user.id, []).append(position)
+
+    async with processor:
+        started = time.perf_counter()
+        tasks = [
+            asyncio.create_task(processor.process_update(update, handler(update, delay)))
+            for update, delay in zip(updates, delays)
+        ]
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    reordered = sum(1 for answers in applied.values() if answers != sorted(answers))
+    return len(updates) / elapsed, reordered
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--answers", type=int, default=10)
+    parser.add_argument("--delay-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    variants = (
+        ("последовательно", lambda: SimpleUpdateProcessor(1)),
+        ("без блокировок", lambda: SimpleUpdateProcessor(MAX_CONCURRENT_UPDATES)),
+        ("по пользователям", lambda: PerUserUpdateProcessor(MAX_CONCURRENT_UPDATES)),
+    )
+    print(f"{'вариант':<18}{'польз.':>8}{'обновл./с':>12}{'порядок нарушен':>18}")
+    for users in args.users:
+        updates = make_updates(users, args.answers)
+        for name, factory in variants:
+            rate, reordered = asyncio.run(run(factory(), updates, args.delay_ms))
+            print(f"{name:<18}{users:>8}{rate:>12.0f}{reordered:>18}")
+
+
+if __name__ == "__main__":
+    main()
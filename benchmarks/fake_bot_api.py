@@ -0,0 +1,200 @@
+"""Подменный Bot API для замеров и тестов: бот работает без сети и без токена.
+
+- FakeBotAPI подключается к приложению как telegram.request.BaseRequest
+  (bot.build_application(request=FakeBotAPI())): на каждый метод отвечает
+  правдоподобным JSON и записывает вызовы (calls - счетчик по методам,
+  requests - методы с параметрами по порядку).
+- FakeTelegramServer - локальный HTTP-сервер с тем же протоколом, что у
+  api.telegram.org (getUpdates с long polling, sendMessage, editMessageText,
+  answerCallbackQuery и др.). Бот подключается к нему настоящим HTTP-клиентом
+  PTB через BOT_API_BASE_URL=http://127.0.0.1:<порт>/bot.
+- UpdateFactory собирает JSON входящих обновлений так, как их присылает Telegram.
+"""
+
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter, defaultdict
+from urllib.parse import parse_qsl, urlsplit
+
+from telegram.request import BaseRequest
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Quiz", "username": "quiz_bot"}
+
+
+def make_user(user_id):
+    return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "username": f"user{user_id}"}
+
+
+def make_message(chat_id, text="", message_id=1, sender=None):
+    return {
+        "message_id": message_id,
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private"},
+        "from": sender or BOT_USER,
+        "text": text,
+    }
+
+
+class UpdateFactory:
+    """Собирает JSON обновлений с последовательными update_id"""
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+
+    def command(self, user_id, command):
+        message = make_message(user_id, command, sender=make_user(user_id))
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+        return {"update_id": next(self._ids), "message": message}
+
+    def callback(self, user_id, data):
+        update_id = next(self._ids)
+        return {
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id),
+                "from": make_user(user_id),
+                "chat_instance": str(user_id),
+                "data": data,
+                "message": make_message(user_id),
+            },
+        }
+
+
+class FakeBotAPI(BaseRequest):
+    """BaseRequest, который отвечает сам, а не обращается к api.telegram.org"""
+
+    def __init__(self):
+        self.calls = Counter()
+        self.requests = []
+        self._message_ids = itertools.count(100)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def reset(self):
+        self.calls.clear()
+        self.requests.clear()
+
+    def _result(self, method, params):
+        if method == "getMe":
+            return BOT_USER
+        if method in ("sendMessage", "editMessageText"):
+            return make_message(
+                params.get("chat_id", 0), params.get("text", ""), next(self._message_ids)
+            )
+        return True
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        api_method = url.rsplit("/", 1)[-1]
+        params = request_data.parameters if request_data is not None else {}
+        self.calls[api_method] += 1
+        self.requests.append((api_method, params))
+        body = {"ok": True, "result": self._result(api_method, params)}
+        return 200, json.dumps(body).encode("utf-8")
+
+
+class FakeTelegramServer:
+    """HTTP-сервер Bot API в памяти.
+
+    Обновления для бота кладутся через push_update() и выдаются ему в
+    getUpdates. Каждое сообщение бота (sendMessage, editMessageText)
+    попадает в очередь чата: outbox(chat_id).get() возвращает
+    (время, метод, параметры).
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self.calls = Counter()
+        self._server = None
+        self._updates = []
+        self._new_updates = asyncio.Event()
+        self._message_ids = itertools.count(100)
+        self._outboxes = defaultdict(asyncio.Queue)
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}/bot"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def push_update(self, update):
+        self._updates.append(update)
+        self._new_updates.set()
+
+    def outbox(self, chat_id):
+        return self._outboxes[chat_id]
+
+    async def _get_updates(self, params):
+        offset = int(params.get("offset", 0))
+        limit = int(params.get("limit", 100))
+        timeout = float(params.get("timeout", 0))
+        # Подтвержденные ботом обновления (id меньше offset) удаляются
+        self._updates = [u for u in self._updates if u["update_id"] >= offset]
+        if not self._updates and timeout > 0:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._updates[:limit]
+
+    async def _call(self, method, params):
+        self.calls[method] += 1
+        if method == "getUpdates":
+            return await self._get_updates(params)
+        if method == "getMe":
+            return BOT_USER
+        if method in ("sendMessage", "editMessageText"):
+            chat_id = int(params.get("chat_id", 0))
+            self._outboxes[chat_id].put_nowait((time.perf_counter(), method, params))
+            return make_message(chat_id, params.get("text", ""), next(self._message_ids))
+        return True
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                _, target, _ = request_line.decode("latin-1").split(" ", 2)
+                length = 0
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    if name.strip().lower() == "content-length":
+                        length = int(value.strip())
+                body = await reader.readexactly(length) if length else b""
+
+                url = urlsplit(target)
+                method = url.path.rsplit("/", 1)[-1]
+                params = dict(parse_qsl(url.query))
+                params.update(parse_qsl(body.decode("utf-8")))
+                result = await self._call(method, params)
+
+                payload = json.dumps({"ok": True, "result": result}).encode("utf-8")
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(payload)}\r\n\r\n".encode("ascii")
+                    + payload
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # CancelledError - остановка цикла событий во время long polling
+            pass
+        finally:
+            writer.close()
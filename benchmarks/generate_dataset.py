@@ -0,0 +1,229 @@
+"""Генератор синтетической базы той же схемы, что asu_quiz.db.
+
+Заполняет questions, user_stats, custom_tests/custom_questions,
+user_progress/session_questions нужным числом строк. Схема создается
+из моделей database.py, user_version выставляется на последнюю миграцию,
+так что бот может работать с такой базой без обновления. Запуск из корня
+репозитория:
+
+    python benchmarks/generate_dataset.py big.db --users 1000000
+    python benchmarks/generate_dataset.py big.db --users 1000000 --custom-tests 100000 --questions-per-level 10000
+
+По умолчанию остальные размеры пропорциональны --users (см. scaled_sizes).
+"""
+
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import (
+    MIGRATIONS,
+    Base,
+    CustomQuestion,
+    CustomTest,
+    Question,
+    SessionQuestion,
+    UserProgress,
+    UserStats,
+    make_engine,
+)
+
+LEVELS = [
+    f"{level}_{lang}"
+    for lang in ("python", "java", "sql")
+    for level in ("junior", "middle", "senior")
+]
+QUESTIONS_PER_TEST = 10
+CUSTOM_TEST_QUESTIONS = 5
+# Строк в одном INSERT (executemany)
+CHUNK_SIZE = 20000
+
+
+def scaled_sizes(users):
+    """Размеры остальных таблиц для заданного числа пользователей.
+
+    1 000 000 пользователей -> 100 000 пользовательских тестов,
+    10 000 вопросов на уровень, 100 000 тестов в user_progress.
+    """
+    return {
+        "users": users,
+        "custom_tests": max(1, users // 10),
+        "questions_per_level": max(QUESTIONS_PER_TEST, users // 100),
+        "sessions": max(1, users // 10),
+    }
+
+
+def _insert(connection, table, rows):
+    for chunk in iter(lambda: list(itertools.islice(rows, CHUNK_SIZE)), []):
+        connection.execute(table.insert(), chunk)
+
+
+def _questions(questions_per_level):
+    for level in LEVELS:
+        for i in range(questions_per_level):
+            yield {
+                "level": level,
+                "question_text": f"Вопрос {i} уровня {level}: что выведет этот фрагмент кода?",
+                "option1": f"Вариант A{i}",
+                "option2": f"Вариант B{i}",
+                "option3": f"Вариант C{i}",
+                "option4": f"Вариант D{i}",
+                "correct_option": i % 4 + 1,
+            }
+
+
+def _user_stats(users, now):
+    for user_id in range(1, users + 1):
+        row = {
+            "user_id": user_id,
+            "username": f"user{user_id}",
+            "mmr": random.randint(0, 3000),
+            "total_tests": random.randint(0, 20),
+            "last_test_date": now - timedelta(days=random.randint(0, 365)),
+            "last_mmr_change": random.randint(-100, 150),
+        }
+        for lang in ("python", "java", "sql"):
+            # Примерно треть пользователей не проходила тесты по языку
+            tests = random.choice((0, random.randint(1, 50)))
+            row[f"total_tests_{lang}"] = tests
+            row[f"mmr_{lang}"] = random.randint(0, 3000) if tests else 1000
+        yield row
+
+
+def _custom_tests(custom_tests, users, now):
+    for test_id in range(1, custom_tests + 1):
+        author_id = random.randint(1, users)
+        yield {
+            "id": test_id,
+            "name": f"Тест {test_id}",
+            "author_id": author_id,
+            "author_username": f"user{author_id}",
+            "created_at": now - timedelta(days=random.randint(0, 365)),
+        }
+
+
+def _custom_questions(custom_tests):
+    for test_id in range(1, custom_tests + 1):
+        for i in range(CUSTOM_TEST_QUESTIONS):
+            yield {
+                "test_id": test_id,
+                "question_text": f"Вопрос {i} теста {test_id}",
+                "option1": "a",
+                "option2": "b",
+                "option3": "c",
+                "option4": "d",
+                "correct_option": i % 4 + 1,
+            }
+
+
+def _sessions(sessions, users, questions_per_level, now):
+    """Пары (строка user_progress, строки session_questions).
+
+    Половина тестов активна (идут сейчас), остальные завершены в последние
+    90 дней - их удаляет обслуживание (maintenance.py).
+    """
+    for progress_id, user_id in enumerate(
+        random.sample(range(1, users + 1), min(sessions, users)), start=1
+    ):
+        level_index = random.randrange(len(LEVELS))
+        first_id = level_index * questions_per_level + 1
+        question_ids = random.sample(
+            range(first_id, first_id + questions_per_level), QUESTIONS_PER_TEST
+        )
+        is_testing = progress_id % 2 == 0
+        answered = random.randrange(QUESTIONS_PER_TEST) if is_testing else QUESTIONS_PER_TEST
+        answered_at = now - (
+            timedelta(minutes=random.randint(0, 30))
+            if is_testing
+            else timedelta(days=random.uniform(0, 90))
+        )
+        progress = {
+            "id": progress_id,
+            "user_id": user_id,
+            "level": LEVELS[level_index],
+            "current_question": answered,
+            "correct_answers": random.randint(0, answered),
+            "is_testing": is_testing,
+            "last_answer_time": answered_at,
+        }
+        answers = [
+            {
+                "session_id": progress_id,
+                "position": position,
+                "question_id": question_id,
+                "chosen_option": random.randint(1, 4) if position < answered else None,
+                "is_correct": random.random() < 0.6 if position < answered else None,
+                "answered_at": answered_at if position < answered else None,
+            }
+            for position, question_id in enumerate(question_ids)
+        ]
+        yield progress, answers
+
+
+def generate_dataset(path, users, custom_tests, questions_per_level, sessions, seed=0):
+    """Создает файл базы path (существующий перезаписывается)"""
+    random.seed(seed)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    engine = make_engine(path)
+    now = datetime.utcnow()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        # Как create_tables: auto_vacuum включается до создания таблиц
+        connection.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        connection.exec_driver_sql("VACUUM")
+    Base.metadata.create_all(engine)
+
+    with engine.begin() as connection:
+        connection.exec_driver_sql(f"PRAGMA user_version = {len(MIGRATIONS)}")
+        _insert(connection, Question.__table__, _questions(questions_per_level))
+        _insert(connection, UserStats.__table__, _user_stats(users, now))
+        _insert(connection, CustomTest.__table__, _custom_tests(custom_tests, users, now))
+        _insert(connection, CustomQuestion.__table__, _custom_questions(custom_tests))
+
+        pairs = list(_sessions(sessions, users, questions_per_level, now))
+        _insert(connection, UserProgress.__table__, (progress for progress, _ in pairs))
+        _insert(
+            connection,
+            SessionQuestion.__table__,
+            (answer for _, answers in pairs for answer in answers),
+        )
+    with engine.connect() as connection:
+        connection.exec_driver_sql("ANALYZE")
+        connection.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="файл создаваемой базы")
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--custom-tests", type=int)
+    parser.add_argument("--questions-per-level", type=int)
+    parser.add_argument("--sessions", type=int, help="строк user_progress")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    sizes = scaled_sizes(args.users)
+    for name in ("custom_tests", "questions_per_level", "sessions"):
+        if getattr(args, name) is not None:
+            sizes[name] = getattr(args, name)
+
+    started = time.perf_counter()
+    generate_dataset(args.path, seed=args.seed, **sizes)
+    size_mb = os.path.getsize(args.path) / 1024 / 1024
+    print(
+        f"{args.path}: {sizes}, {size_mb:.1f} МиБ "
+        f"за {time.perf_counter() - started:.1f} с"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""Нагрузочный тест: виртуальные пользователи проходят тесты через локальный Bot API.
+
+Бот запускается целиком (bot.build_application, long polling через
+настоящий HTTP-клиент PTB) против FakeTelegramServer из fake_bot_api.py
+на временной базе. Каждый виртуальный пользователь нажимает кнопки так же,
+как человек: start_test -> lang_ -> level_ -> answer_ x10, а часть
+пользователей (--custom-share) проходит пользовательский тест из каталога:
+test_catalog -> run_custom_ -> custom_answer_. Следующая кнопка берется из
+клавиатуры, которую прислал бот.
+
+Задержка шага - время от появления обновления в getUpdates до сообщения бота
+с клавиатурой для следующего шага (то, что ждет пользователь). Генератор
+нагрузки и бот работают в одном процессе, поэтому цифры - нижняя оценка
+пропускной способности. Запуск из корня репозитория:
+
+    python benchmarks/load_test.py --users 200 --think-ms 200
+    python benchmarks/load_test.py --users 50 --telegram-limits   # с лимитами Telegram
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_bot_api import FakeTelegramServer, UpdateFactory
+
+CUSTOM_TEST_QUESTIONS = 5
+
+
+def step_name(data):
+    """Название шага для отчета: callback_data без параметров"""
+    for prefix in ("custom_answer_", "run_custom_", "answer_", "lang_", "level_"):
+        if data.startswith(prefix):
+            return prefix.rstrip("_")
+    return data
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--custom-share", type=float, default=0.2)
+    parser.add_argument("--think-ms", type=float, default=200.0)
+    parser.add_argument("--ramp-s", type=float, default=1.0, help="за сколько секунд стартуют все пользователи")
+    parser.add_argument("--step-timeout", type=float, default=60.0)
+    parser.add_argument("--compact", action="store_true", help="COMPACT_SESSION_MODE")
+    parser.add_argument(
+        "--telegram-limits",
+        action="store_true",
+        help="оставить лимиты отправки send_scheduler (по умолчанию сняты)",
+    )
+    return parser.parse_args()
+
+
+def prepare_database(tmp):
+    """Временная база с вопросами и одним пользовательским тестом"""
+    os.environ["DB_PATH"] = os.path.join(tmp, "load.db")
+    from database import create_tables, get_db, CustomQuestion, CustomTest
+    from seed import seed_question_bank
+
+    create_tables()
+    with contextlib.redirect_stdout(io.StringIO()):
+        seed_question_bank()
+    with get_db() as db:
+        db.add(
+            CustomTest(
+                name="Нагрузочный",
+                author_id=1,
+                author_username="load",
+                questions=[
+                    CustomQuestion(
+                        question_text=f"Вопрос {i}",
+                        option1="a",
+                        option2="b",
+                        option3="c",
+                        option4="d",
+                        correct_option=i % 4 + 1,
+                    )
+                    for i in range(CUSTOM_TEST_QUESTIONS)
+                ],
+            )
+        )
+        db.commit()
+
+
+class LoadGenerator:
+    def __init__(self, server, args):
+        self.server = server
+        self.args = args
+        self.factory = UpdateFactory()
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+        self.updates = 0
+
+    async def on_error(self, update, context):
+        """Обработчик ошибок приложения: считает исключения обработчиков по типу"""
+        self.errors[type(context.error).__name__] += 1
+
+    async def press(self, user_id, data):
+        """Нажимает кнопку и ждет сообщение бота с клавиатурой; возвращает кнопки"""
+        outbox = self.server.outbox(user_id)
+        started = time.perf_counter()
+        self.server.push_update(self.factory.callback(user_id, data))
+        self.updates += 1
+        while True:
+            received, _, params = await asyncio.wait_for(
+                outbox.get(), self.args.step_timeout
+            )
+            markup = params.get("reply_markup")
+            if markup:
+                break
+        self.latencies[step_name(data)].append(received - started)
+        rows = json.loads(markup)["inline_keyboard"]
+        return [button["callback_data"] for row in rows for button in row if "callback_data" in button]
+
+    async def think(self):
+        if self.args.think_ms:
+            await asyncio.sleep(random.uniform(0, 2 * self.args.think_ms) / 1000)
+
+    async def answer_all(self, user_id, buttons, prefix):
+        while any(b.startswith(prefix) for b in buttons):
+            await self.think()
+            options = [b for b in buttons if b.startswith(prefix)]
+            buttons = await self.press(user_id, random.choice(options))
+
+    async def standard_flow(self, user_id):
+        lang = random.choice(("python", "java", "sql"))
+        await self.press(user_id, "start_test")
+        await self.think()
+        await self.press(user_id, f"lang_{lang}")
+        await self.think()
+        buttons = await self.press(user_id, f"level_{lang}_junior")
+        await self.answer_all(user_id, buttons, "answer_")
+
+    async def custom_flow(self, user_id):
+        buttons = await self.press(user_id, "test_catalog")
+        run = next(b for b in buttons if b.startswith("run_custom_"))
+        await self.think()
+        buttons = await self.press(user_id, run)
+        await self.answer_all(user_id, buttons, "custom_answer_")
+
+    async def virtual_user(self, user_id, delay):
+        await asyncio.sleep(delay)
+        flow = (
+            self.custom_flow
+            if random.random() < self.args.custom_share
+            else self.standard_flow
+        )
+        try:
+            await flow(user_id)
+        except asyncio.TimeoutError:
+            self.errors["timeout"] += 1
+
+    async def run(self):
+        users = self.args.users
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(
+                self.virtual_user(1000 + i, self.args.ramp_s * i / users)
+                for i in range(users)
+            )
+        )
+        return time.perf_counter() - started
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def report(generator, elapsed, server):
+    print(f"{'шаг':<16}{'кол-во':>8}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}")
+    everything = []
+    for step, values in sorted(generator.latencies.items()):
+        everything.extend(values)
+        print(
+            f"{step:<16}{len(values):>8}{statistics.median(values) * 1000:>10.1f}"
+            f"{percentile(values, 0.95) * 1000:>10.1f}{percentile(values, 0.99) * 1000:>10.1f}"
+        )
+    if everything:
+        print(
+            f"{'все шаги':<16}{len(everything):>8}{statistics.median(everything) * 1000:>10.1f}"
+            f"{percentile(everything, 0.95) * 1000:>10.1f}{percentile(everything, 0.99) * 1000:>10.1f}"
+        )
+    print(
+        f"\nобновлений: {generator.updates} за {elapsed:.1f} с "
+        f"({generator.updates / elapsed:.0f} обновл./с), ошибок: {dict(generator.errors) or 0}"
+    )
+    print("вызовы Bot API:", dict(server.calls))
+
+
+async def main(args):
+    import bot
+
+    # bot.py включает INFO-логирование; во время замера оставляем предупреждения
+    logging.getLogger().setLevel(os.getenv("LOAD_TEST_LOG_LEVEL", "WARNING"))
+
+    server = FakeTelegramServer()
+    await server.start()
+    bot.BOT_API_BASE_URL = server.base_url
+    bot.COMPACT_SESSION_MODE = args.compact
+    bot.question_bank.load()
+    bot.leaderboard.load()
+
+    application = bot.build_application()
+    generator = LoadGenerator(server, args)
+    application.add_error_handler(generator.on_error)
+    async with application:
+        await application.start()
+        await application.updater.start_polling(poll_interval=0, timeout=10)
+        elapsed = await generator.run()
+        await application.updater.stop()
+        await application.stop()
+    await server.stop()
+    report(generator, elapsed, server)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    os.environ.setdefault("BOT_TOKEN", "1:load")
+    if not arguments.telegram_limits:
+        for name in ("BOT_API_GLOBAL_RATE", "BOT_API_CHAT_RATE", "BOT_API_CHAT_BURST"):
+            os.environ[name] = "1000000"
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        prepare_database(tmp_dir)
+        asyncio.run(main(arguments))
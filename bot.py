@@ -1,6 +1,5 @@
 import logging
 import asyncio
-import random
 import os
 from contextlib import contextmanager
 from dotenv import load_dotenv
@@ -14,9 +13,53 @@ from telegram.ext import (
     MessageHandler,
     filters,
 )
-from database import create_tables, get_db, Question, UserProgress, UserStats
-from sqlalchemy import select, desc, func
-from datetime import datetime
+from database import (
+    apply_mmr_result,
+    async_engine,
+    create_tables,
+    ensure_user_stats,
+    get_async_db,
+    unit_of_work,
+    write_transaction,
+    SessionQuestion,
+    UserProgress,
+    UserStats,
+)
+from sqlalchemy import select, delete, insert
+from leaderboard import leaderboard
+from maintenance import MAINTENANCE_INTERVAL_HOURS, run_maintenance
+from metrics import (
+    METRICS_ENABLED,
+    TESTS_FINISHED,
+    TESTS_STARTED,
+    MetricsServer,
+    instrument_application,
+    register_gauge,
+)
+from profiler import ADMIN_USER_IDS, install_signal_handler, profile_command
+from query_audit import DB_QUERY_AUDIT, audit_handlers
+from question_bank import question_bank
+from rendering import (
+    COMPACT_SESSION_MODE,
+    TEST_RESULTS_KEYBOARD,
+    answer_feedback,
+    answer_keyboard,
+    answer_verdict,
+    question_message,
+)
+from send_scheduler import (
+    BOT_API_METRICS_INTERVAL,
+    PRIORITY_ANSWER,
+    PRIORITY_NOTIFICATION,
+    SendScheduler,
+    log_send_metrics,
+)
+from session_store import (
+    SESSION_FLUSH_INTERVAL,
+    active_sessions,
+    flush_active_sessions,
+)
+from update_processing import MAX_CONCURRENT_UPDATES, PerUserUpdateProcessor
 
 from custom_tests import (
     start_test_creation,
@@ -60,6 +103,23 @@ logging.basicConfig(
 # Получение токена из переменных окружения
 TOKEN = os.getenv("BOT_TOKEN")
 
+# Адрес Bot API (по умолчанию api.telegram.org); например, собственный
+# сервер telegram-bot-api или локальный подменный сервер для замеров
+BOT_API_BASE_URL = os.getenv("BOT_API_BASE_URL")
+
+# Способ получения обновлений: "polling" (по умолчанию) или "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+# Настройки webhook: адрес и порт локального сервера, путь, публичный URL
+# (https://<домен>/<путь>, на него Telegram отправляет обновления),
+# секрет для заголовка X-Telegram-Bot-Api-Secret-Token и максимальное
+# число одновременных соединений от Telegram
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_SECRET_TOKEN = os.getenv("WEBHOOK_SECRET_TOKEN")
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+
 # Константы
 LANGUAGE_DISPLAY = {"python": "Python", "sql": "SQL", "java": "Java"}
 
@@ -146,6 +206,7 @@ async def show_difficulty_levels(update: Update, context: ContextTypes.DEFAULT_T
     )
 
 
+@unit_of_work
 async def handle_level_selection(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
@@ -156,208 +217,262 @@ async def handle_level_selection(update: Update, context: ContextTypes.DEFAULT_T
     username = query.from_user.username or f"User{user_id}"
     level_key = f"{level}_{language}"
 
-    with get_db() as db:
-        # Очищаем предыдущий прогресс
-        db.query(UserProgress).filter(UserProgress.user_id == user_id).delete()
-
-        # Получаем все вопросы для выбранного языка и уровня
-        questions = db.query(Question).filter(Question.level == level_key).all()
-
-        # Выбираем 10 случайных вопросов
-        selected_questions = random.sample(questions, min(10, len(questions)))
-        selected_question_ids = [q.id for q in selected_questions]
-
-        # Создаем новый прогресс с выбранными вопросами
-        progress = UserProgress(
-            user_id=user_id,
-            level=level_key,
-            is_testing=True,
-            question_ids=",".join(map(str, selected_question_ids)),
+    # 10 случайных вопросов уровня из банка в памяти
+    selected_question_ids = question_bank.sample(level_key, 10)
+    if not selected_question_ids:
+        # Вопросов уровня нет (или callback_data подделан): тест не
+        # начинается, предыдущий прогресс и статистика не меняются
+        await query.edit_message_text(
+            text="❌ Для этого уровня пока нет вопросов. Выберите другой уровень.",
+            reply_markup=InlineKeyboardMarkup(
+                [
+                    [InlineKeyboardButton("⬅️ Назад", callback_data="start_test")],
+                    [InlineKeyboardButton("🏠 Главное меню", callback_data="main_menu")],
+                ]
+            ),
         )
-        db.add(progress)
+        return
+    first_question = question_bank.get(selected_question_ids[0])
+
+    async with get_async_db() as db:
+        # Сначала чтения, без блокировки записи: предыдущий тест и имя в статистике
+        previous_progress_id, stored_username = (
+            await db.execute(
+                select(
+                    select(UserProgress.id)
+                    .where(UserProgress.user_id == user_id)
+                    .scalar_subquery(),
+                    select(UserStats.username)
+                    .where(UserStats.user_id == user_id)
+                    .scalar_subquery(),
+                )
+            )
+        ).one()
+
+        # Незаписанные ответы предыдущего теста больше не нужны
+        active_sessions.discard(user_id)
+
+        # Изменения выполняются подряд, от BEGIN IMMEDIATE до коммита
+        async with write_transaction(db):
+            # Удаляем предыдущий прогресс вместе с его вопросами
+            if previous_progress_id is not None:
+                await db.execute(
+                    delete(SessionQuestion).where(
+                        SessionQuestion.session_id == previous_progress_id
+                    )
+                )
+                await db.execute(
+                    delete(UserProgress).where(UserProgress.id == previous_progress_id)
+                )
 
-        # Создаем или обновляем статистику пользователя
-        stats = db.query(UserStats).filter(UserStats.user_id == user_id).first()
-        if not stats:
-            stats = UserStats(user_id=user_id, username=username)
-            db.add(stats)
+            # Создаем новый прогресс; его вопросы записываются одним INSERT
+            # (executemany), а не отдельным запросом на каждую строку
+            progress = UserProgress(user_id=user_id, level=level_key, is_testing=True)
+            db.add(progress)
+            await db.flush()
+            await db.execute(
+                insert(SessionQuestion),
+                [
+                    {
+                        "session_id": progress.id,
+                        "position": position,
+                        "question_id": question_id,
+                    }
+                    for position, question_id in enumerate(selected_question_ids)
+                ],
+            )
 
-        db.commit()
+            # Создаем статистику пользователя или обновляем имя, если оно изменилось
+            if stored_username != username:
+                await ensure_user_stats(db, user_id, username)
 
-    lang_name = LANGUAGE_DISPLAY.get(language, "Java")
+    TESTS_STARTED.inc(level_key)
+    session = active_sessions.start(progress, selected_question_ids)
 
-    await query.edit_message_text(
+    lang_name = LANGUAGE_DISPLAY.get(language, "Java")
+    intro = (
         f"📚 Вы выбрали {lang_name}, уровень: {level.capitalize()}\n"
         "Начинаем тестирование! Удачи! 🍀\n\n"
         "Всего будет 10 вопросов. На каждый вопрос дается 4 варианта ответа."
     )
 
-    # Отправляем первый вопрос
-    await send_question(update, context, user_id)
-
-
-async def get_question_message(question, progress):
-    """Форматирует сообщение с вопросом"""
-    return (
-        f"❓ Вопрос {progress.current_question + 1}/10:\n\n"
-        f"{question.question_text}\n\n"
-        f"Варианты ответов:\n"
-        f"1️⃣ {question.option1}\n"
-        f"2️⃣ {question.option2}\n"
-        f"3️⃣ {question.option3}\n"
-        f"4️⃣ {question.option4}"
-    )
-
-
-async def send_question(
-    update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int
-):
-    with get_db() as db:
-        progress = (
-            db.query(UserProgress).filter(UserProgress.user_id == user_id).first()
+    if COMPACT_SESSION_MODE:
+        # Весь тест проходит в этом сообщении
+        first_text = question_message(first_question, 0, len(session.question_ids))
+        await query.edit_message_text(
+            text=f"{intro}\n\n{first_text}", reply_markup=answer_keyboard(0)
         )
-        if not progress or not progress.is_testing:
-            return
+        return
 
-        # Получаем список ID выбранных вопросов
-        question_ids = list(map(int, progress.question_ids.split(",")))
-        if progress.current_question >= len(question_ids):
-            # Тест завершен
-            await finish_test(update, context, user_id, progress.correct_answers)
-            return
+    await query.edit_message_text(intro)
 
-        # Получаем текущий вопрос по его ID
-        current_question_id = question_ids[progress.current_question]
-        question = db.query(Question).filter(Question.id == current_question_id).first()
+    # Отправляем первый вопрос
+    await send_question(context, user_id, first_question, session)
 
-        # Создаем текст сообщения с вопросом
-        message_text = await get_question_message(question, progress)
 
-        # Создаем кнопки с номерами
-        keyboard = [
-            [
-                InlineKeyboardButton("1️⃣", callback_data="answer_1"),
-                InlineKeyboardButton("2️⃣", callback_data="answer_2"),
-                InlineKeyboardButton("3️⃣", callback_data="answer_3"),
-                InlineKeyboardButton("4️⃣", callback_data="answer_4"),
-            ],
-            [
-                InlineKeyboardButton(
-                    "❌ Отменить тест", callback_data="cancel_standard_test"
-                )
-            ],
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-
-        # Отправляем новое сообщение с вопросом
-        await context.bot.send_message(
-            chat_id=user_id, text=message_text, reply_markup=reply_markup
-        )
+async def send_question(
+    context: ContextTypes.DEFAULT_TYPE, user_id: int, question, session
+):
+    """Отправляет вопрос текущей позиции теста (без обращений к БД)"""
+    message_text = question_message(
+        question, session.current_question, len(session.question_ids)
+    )
+    await context.bot.send_message(
+        chat_id=user_id,
+        text=message_text,
+        reply_markup=answer_keyboard(session.current_question),
+        rate_limit_args=PRIORITY_ANSWER,
+    )
 
 
+@unit_of_work
 async def handle_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
 
     user_id = query.from_user.id
-    selected_option = int(query.data.split("_")[1])
+    # answer_<позиция>_<вариант>; у кнопок, отправленных до появления позиции
+    # в callback_data, только answer_<вариант> - они относятся к текущему вопросу
+    parts = query.data.split("_")
+    answered_position = int(parts[1]) if len(parts) == 3 else None
+    selected_option = int(parts[-1])
+    result = None
+
+    # Состояние теста хранится в памяти (session_store), в БД оно попадает
+    # пачками; сразу записывается только завершение теста
+    session = await active_sessions.get(user_id)
+    if session is None or session.current_question_id is None:
+        return
+    # Повторное нажатие или кнопка уже отвеченного вопроса
+    if answered_position is not None and answered_position != session.current_question:
+        return
 
-    with get_db() as db:
-        progress = (
-            db.query(UserProgress).filter(UserProgress.user_id == user_id).first()
-        )
-        if not progress or not progress.is_testing:
-            return
-
-        # Получаем список ID выбранных вопросов
-        question_ids = list(map(int, progress.question_ids.split(",")))
-        # Получаем текущий вопрос по его ID
-        current_question_id = question_ids[progress.current_question]
-        question = db.query(Question).filter(Question.id == current_question_id).first()
-
-        # Проверяем правильность ответа
-        is_correct = question.correct_option == selected_option
-        correct_answer_text = getattr(question, f"option{question.correct_option}")
-        selected_answer_text = getattr(question, f"option{selected_option}")
-
-        # Сохраняем текст вопроса для отображения
-        question_text = await get_question_message(question, progress)
-
-        if is_correct:
-            progress.correct_answers += 1
-            feedback = (
-                f"{question_text}\n\n"
-                "✅ Правильно!\n\n"
-                f"Ваш ответ: {selected_answer_text}"
+    # Получаем текущий вопрос по позиции в тесте
+    question = question_bank.get(session.current_question_id)
+    if question is None:
+        return
+
+    # Проверяем правильность ответа; тексты с результатом берутся из кэша
+    is_correct = question.correct_option == selected_option
+    position, total = session.current_question, len(session.question_ids)
+
+    active_sessions.record_answer(session, selected_option, is_correct)
+
+    # Следующий вопрос или завершение теста
+    next_question = None
+    if session.current_question_id is not None:
+        next_question = question_bank.get(session.current_question_id)
+    else:
+        async with get_async_db() as db, write_transaction(db):
+            await active_sessions.finish(db, session)
+            result = await finish_test(
+                db, user_id, session.level, session.correct_answers
             )
-        else:
-            feedback = (
-                f"{question_text}\n\n"
-                "❌ Неправильно!\n\n"
-                f"Ваш ответ: {selected_answer_text}\n"
-                f"Правильный ответ: {correct_answer_text}"
+        TESTS_FINISHED.inc(session.level)
+        update_leaderboard(user_id, result)
+
+    if COMPACT_SESSION_MODE:
+        # Одно редактирование: результат ответа и следующий вопрос (или итог)
+        verdict = answer_verdict(question, selected_option)
+        if next_question is not None:
+            next_text = question_message(next_question, position + 1, total)
+            await query.edit_message_text(
+                text=f"{verdict}\n\n{next_text}",
+                reply_markup=answer_keyboard(position + 1),
             )
-
-        progress.current_question += 1
-        progress.last_answer_time = datetime.utcnow()
-        db.commit()
+        else:
+            await edit_test_results(query, verdict, result)
+        return
 
     # Обновляем текущее сообщение, убирая кнопки и показывая результат
+    feedback = answer_feedback(question, position, total, selected_option)
     await query.edit_message_text(text=feedback)
 
     # Отправляем следующий вопрос в новом сообщении
-    await send_question(update, context, user_id)
+    if next_question is not None:
+        await send_question(context, user_id, next_question, session)
+    else:
+        await send_test_results(context, user_id, result)
 
 
-async def finish_test(
-    update: Update,
-    context: ContextTypes.DEFAULT_TYPE,
-    user_id: int,
-    correct_answers: int,
-):
-    # Объявляем переменные за пределами контекстного менеджера
-    level = ""
+async def finish_test(db, user_id: int, level: str, correct_answers: int):
+    """Обновляет статистику по итогам теста (без коммита).
+
+    Возвращает словарь с результатом для send_test_results.
+    """
     mmr_change = 0
     old_mmr = 0
     new_mmr = 0
+    total_tests = 0
+    username = None
     lang = None
 
-    with get_db() as db:
-        progress = (
-            db.query(UserProgress).filter(UserProgress.user_id == user_id).first()
+    # Определяем язык теста
+    if "_" in level:
+        # Пример: junior_python, middle_java
+        parts = level.split("_")
+        if len(parts) == 2:
+            _, lang = parts
+        elif len(parts) == 3:
+            # На случай если формат другой
+            lang = parts[-1]
+        else:
+            lang = "java"  # по умолчанию
+    else:
+        lang = "java"
+
+    # Обновляем статистику пользователя одним атомарным UPDATE
+    if lang in ("python", "java", "sql"):
+        mmr_change = UserStats.mmr_change_expression(
+            UserStats.base_mmr_change(correct_answers, level), -100, 150
+        )
+        applied = await apply_mmr_result(
+            db,
+            user_id,
+            getattr(UserStats, f"mmr_{lang}"),
+            getattr(UserStats, f"total_tests_{lang}"),
+            mmr_change,
         )
-        if not progress:
-            return
-
-        level = progress.level
-        progress.is_testing = False
-
-        # Определяем язык теста
-        if "_" in level:
-            # Пример: junior_python, middle_java
-            parts = level.split("_")
-            if len(parts) == 2:
-                _, lang = parts
-            elif len(parts) == 3:
-                # На случай если формат другой
-                lang = parts[-1]
-            else:
-                lang = "java"  # по умолчанию
+        if applied:
+            mmr_change = applied["mmr_change"]
+            old_mmr = applied["old_mmr"]
+            new_mmr = applied["new_mmr"]
+            total_tests = applied["total_tests"]
+            username = applied["username"]
         else:
-            lang = "java"
-
-        # Обновляем статистику пользователя
-        stats = db.query(UserStats).filter(UserStats.user_id == user_id).first()
-        if stats and lang in ("python", "java", "sql"):
-            mmr_field = f"mmr_{lang}"
-            tests_field = f"total_tests_{lang}"
-            mmr_change = stats.calculate_mmr_change(correct_answers, level)
-            old_mmr = getattr(stats, mmr_field)
-            setattr(stats, mmr_field, max(0, old_mmr + mmr_change))
-            new_mmr = getattr(stats, mmr_field)
-            setattr(stats, tests_field, getattr(stats, tests_field) + 1)
-            stats.last_test_date = datetime.utcnow()
-        db.commit()
+            mmr_change = 0
+
+    return {
+        "level": level,
+        "lang": lang,
+        "correct_answers": correct_answers,
+        "mmr_change": mmr_change,
+        "old_mmr": old_mmr,
+        "new_mmr": new_mmr,
+        "total_tests": total_tests,
+        "username": username,
+    }
+
+
+def update_leaderboard(user_id: int, result):
+    """Переносит итог теста в таблицу лидеров в памяти (после коммита)"""
+    if result["total_tests"]:
+        leaderboard.update(
+            result["lang"],
+            user_id,
+            result["username"],
+            result["new_mmr"],
+            result["total_tests"],
+        )
+
+
+def test_results_text(result):
+    """Текст с результатами теста"""
+    level = result["level"]
+    correct_answers = result["correct_answers"]
+    mmr_change = result["mmr_change"]
+    old_mmr = result["old_mmr"]
+    new_mmr = result["new_mmr"]
 
     percentage = (correct_answers / 10) * 100
 
@@ -382,25 +497,31 @@ async def finish_test(
         f"Правильных ответов: {correct_answers}/10 ({percentage:.1f}%)\n"
         f"MMR: {old_mmr} {mmr_text} {abs(mmr_change)} = {new_mmr}\n"
     )
+    return f"🎯 Результат теста:\n\n{grade}{stats_text}"
 
+
+async def send_test_results(context: ContextTypes.DEFAULT_TYPE, user_id: int, result):
+    """Отправляет результаты теста и кнопки навигации"""
     # Сначала отправляем сообщение с результатами без кнопок
     try:
-        await context.bot.send_message(
-            chat_id=user_id, text=f"🎯 Результат теста:\n\n{grade}{stats_text}"
-        )
+        await context.bot.send_message(chat_id=user_id, text=test_results_text(result))
     except Exception as e:
         logging.error(f"Ошибка при отображении результатов: {e}")
 
     # Затем отправляем новое сообщение с кнопками навигации
-    keyboard = [
-        [InlineKeyboardButton("🔄 Пройти тест снова", callback_data="start_test")],
-        [InlineKeyboardButton("📊 Таблица лидеров", callback_data="leaderboard")],
-        [InlineKeyboardButton("🏠 Главное меню", callback_data="main_menu")],
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-
     await context.bot.send_message(
-        chat_id=user_id, text="Выберите дальнейшее действие:", reply_markup=reply_markup
+        chat_id=user_id,
+        text="Выберите дальнейшее действие:",
+        reply_markup=TEST_RESULTS_KEYBOARD,
+        rate_limit_args=PRIORITY_NOTIFICATION,
+    )
+
+
+async def edit_test_results(query, header, result):
+    """Компактный режим: итог теста и кнопки навигации в текущем сообщении"""
+    await query.edit_message_text(
+        text=f"{header}\n\n{test_results_text(result)}\nВыберите дальнейшее действие:",
+        reply_markup=TEST_RESULTS_KEYBOARD,
     )
 
 
@@ -410,35 +531,33 @@ async def show_leaderboard(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if context.user_data.get("leaderboard_language"):
         selected_language = context.user_data["leaderboard_language"]
         lang_display = LANGUAGE_DISPLAY.get(selected_language, selected_language.capitalize())
-        mmr_field = f"mmr_{selected_language}"
-        tests_field = f"total_tests_{selected_language}"
-        with get_db() as db:
-            # Получаем топ-5 пользователей по MMR выбранного языка
-            top_users = (
-                db.query(UserStats)
-                .filter(getattr(UserStats, tests_field) > 0)
-                .order_by(getattr(UserStats, mmr_field).desc())
-                .limit(5)
-                .all()
-            )
+        # Получаем топ-5 пользователей по MMR выбранного языка (из памяти)
+        top_users = leaderboard.top(selected_language, 5)
         text = f"🏆 Таблица лидеров по {lang_display}\n\n"
         medals = ["🥇", "🥈", "🥉", "4️⃣", "5️⃣"]
         ranks = ["Грандмастер", "Мастер", "Эксперт", "Специалист", "Новичок"]
         for i, user in enumerate(top_users):
             medal = medals[i]
-            rank = ranks[i] if getattr(user, mmr_field) >= 1000 else "Новичок"
+            rank = ranks[i] if user.mmr >= 1000 else "Новичок"
             username = user.username or f"User{user.user_id}"
-            stars = "⭐" * (getattr(user, mmr_field) // 200)
+            stars = "⭐" * (user.mmr // 200)
             text += (
                 f"{medal} {username}\n"
                 f"    {stars}\n"
                 f"    Ранг: {rank}\n"
-                f"    MMR: {getattr(user, mmr_field)}\n"
-                f"    Тестов пройдено: {getattr(user, tests_field)}\n\n"
+                f"    MMR: {user.mmr}\n"
+                f"    Тестов пройдено: {user.total_tests}\n\n"
             )
         if not top_users:
             text += "😢 Пока никто не прошел ни одного теста по этому языку\n"
             text += "🎯 Станьте первым в рейтинге!\n"
+        else:
+            # Место текущего пользователя
+            position = leaderboard.rank(selected_language, query.from_user.id)
+            if position:
+                place, total = position
+                percentile = place / total * 100
+                text += f"📍 Ваше место: {place} из {total} (топ {percentile:.0f}%)\n"
         keyboard = [
             [InlineKeyboardButton("🔄 Пройти тест", callback_data="start_test")],
             [InlineKeyboardButton("🏠 Главное меню", callback_data="main_menu")],
@@ -494,20 +613,20 @@ async def show_help(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 # Добавляем новый обработчик для отмены обычного теста
+@unit_of_work
 async def cancel_standard_test(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Отменяет прохождение обычного теста (Python, Java, SQL)."""
     query = update.callback_query
     await query.answer()
     user_id = query.from_user.id
 
-    with get_db() as db:
-        # Находим текущий прогресс и помечаем тест как завершенный
-        progress = (
-            db.query(UserProgress).filter(UserProgress.user_id == user_id).first()
-        )
-        if progress:
-            progress.is_testing = False
-            db.commit()
+    async with get_async_db() as db:
+        # Находим текущий тест и помечаем его как завершенный,
+        # записывая накопленные ответы
+        session = await active_sessions.get(user_id)
+        if session:
+            async with write_transaction(db):
+                await active_sessions.finish(db, session)
 
     await query.edit_message_text(
         "Тест отменен. Вы можете выбрать другой тест или вернуться в главное меню.",
@@ -584,6 +703,9 @@ def setup_handlers(application):
     application.add_handler(conv_handler)  # Добавляем обработчик диалога
 
     application.add_handler(CommandHandler("start", start))
+    # Профилирование по требованию (только для ADMIN_USER_IDS)
+    if ADMIN_USER_IDS:
+        application.add_handler(CommandHandler("profile", profile_command))
     application.add_handler(
         CallbackQueryHandler(show_language_selection, pattern="^start_test$")
     )
@@ -622,18 +744,113 @@ def setup_handlers(application):
     )
 
 
+def build_application(request=None):
+    """Создает приложение с обработчиками и периодическими задачами.
+
+    request - необязательный объект telegram.request.BaseRequest для запросов
+    к Bot API (например, подменный сервер в замерах).
+    """
+    # Обновления разных пользователей обрабатываются параллельно, одного
+    # пользователя - по очереди; исходящие запросы проходят через планировщик
+    # с лимитами Telegram. При остановке сохраняем активные тесты в БД
+    builder = (
+        Application.builder()
+        .token(TOKEN)
+        .concurrent_updates(PerUserUpdateProcessor(MAX_CONCURRENT_UPDATES))
+        .rate_limiter(SendScheduler())
+        .post_shutdown(flush_active_sessions)
+    )
+    if BOT_API_BASE_URL:
+        builder = builder.base_url(BOT_API_BASE_URL)
+    metrics_server = MetricsServer() if METRICS_ENABLED else None
+
+    async def post_init(application):
+        # kill -USR1 <pid> включает профилирование (см. profiler.py)
+        await install_signal_handler(application)
+        if metrics_server is not None:
+            await metrics_server.start(application)
+
+    builder = builder.post_init(post_init)
+    if metrics_server is not None:
+        builder = builder.post_stop(metrics_server.stop)
+    if request is not None:
+        builder = builder.request(request)
+    application = builder.build()
+
+    # Настраиваем обработчики
+    setup_handlers(application)
+
+    # Метрики Prometheus (METRICS_PORT): обработчики оборачиваются после регистрации
+    if METRICS_ENABLED:
+        instrument_application(application, async_engine.sync_engine)
+        register_gauge(
+            "quiz_bot_active_sessions",
+            "Стандартные тесты в памяти (session_store)",
+            lambda: len(active_sessions),
+        )
+
+    # Аудит запросов к БД (DB_QUERY_AUDIT): запросы по обработчикам и N+1
+    if DB_QUERY_AUDIT:
+        audit_handlers(application)
+
+    # Периодически записываем состояние активных тестов в БД
+    application.job_queue.run_repeating(
+        flush_active_sessions,
+        interval=SESSION_FLUSH_INTERVAL,
+        first=SESSION_FLUSH_INTERVAL,
+    )
+
+    # Обслуживание БД: очистка старых завершенных тестов и сжатие файла
+    application.job_queue.run_repeating(
+        run_maintenance,
+        interval=MAINTENANCE_INTERVAL_HOURS * 3600,
+        first=MAINTENANCE_INTERVAL_HOURS * 3600,
+    )
+    # Метрики очереди исходящих сообщений
+    application.job_queue.run_repeating(
+        log_send_metrics,
+        interval=BOT_API_METRICS_INTERVAL,
+        first=BOT_API_METRICS_INTERVAL,
+    )
+    return application
+
+
+def run_application(application):
+    """Запускает бота в режиме BOT_MODE (long polling или webhook)"""
+    if BOT_MODE not in ("polling", "webhook"):
+        raise ValueError(
+            f"Неизвестный BOT_MODE: {BOT_MODE} (ожидается polling или webhook)"
+        )
+    if BOT_MODE == "webhook" and not WEBHOOK_URL:
+        raise ValueError("Для BOT_MODE=webhook нужно задать WEBHOOK_URL")
+
+    if BOT_MODE == "webhook":
+        logging.info(
+            f"Запуск в режиме webhook: {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH}"
+        )
+        application.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=WEBHOOK_URL,
+            secret_token=WEBHOOK_SECRET_TOKEN,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+            allowed_updates=Update.ALL_TYPES,
+        )
+    else:
+        application.run_polling(allowed_updates=Update.ALL_TYPES)
+
+
 def main():
     # Создаем таблицы базы данных
     create_tables()
 
-    # Инициализируем бота
-    application = Application.builder().token(TOKEN).build()
-
-    # Настраиваем обработчики
-    setup_handlers(application)
+    # Загружаем банк вопросов и таблицу лидеров в память
+    question_bank.load()
+    leaderboard.load()
 
     # Запускаем бота
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    run_application(build_application())
 
 
 if __name__ == "__main__":
@@ -8,10 +8,31 @@ from telegram import (
 from telegram.ext import ContextTypes, ConversationHandler, CommandHandler
 import json
 import os
-from datetime import datetime
+
+from sqlalchemy import select, delete
+from sqlalchemy.orm import selectinload
 
 # Импортируем get_db_session и UserStats из database.py
-from database import get_db, UserStats, CustomTest, CustomQuestion
+from database import (
+    apply_mmr_result,
+    ensure_user_stats,
+    get_db,
+    get_async_db,
+    unit_of_work,
+    write_transaction,
+    UserStats,
+    CustomTest,
+    CustomQuestion,
+)
+from rendering import (
+    CANCEL_CREATION_KEYBOARD,
+    CUSTOM_ANSWER_KEYBOARD,
+    custom_answer_feedback,
+    custom_question_message,
+)
+from metrics import TESTS_FINISHED, TESTS_STARTED
+from query_audit import audit_scope
+from send_scheduler import PRIORITY_ANSWER, PRIORITY_NOTIFICATION
 
 # Импортируем main_menu из bot.py
 # Это может создать цикл импорта, если bot.py тоже импортирует что-то из custom_tests.py
@@ -41,9 +62,12 @@ def load_custom_tests():
     """Загружает тесты из базы данных и группирует их по user_id"""
     tests_data = {}
 
-    with get_db() as db:
-        # Получаем все тесты
-        all_tests = db.query(CustomTest).all()
+    with get_db() as db, audit_scope("load_custom_tests"):
+        # Получаем все тесты; вопросы загружаются пачками (SELECT ... IN),
+        # а не отдельным запросом на каждый тест
+        all_tests = (
+            db.query(CustomTest).options(selectinload(CustomTest.questions)).all()
+        )
 
         for test in all_tests:
             # Преобразуем объект теста в словарь
@@ -74,14 +98,14 @@ def load_custom_tests():
     return tests_data
 
 
-def save_custom_tests(tests_data):
+async def save_custom_tests(tests_data):
     """Сохраняет тесты в базу данных"""
-    with get_db() as db:
+    async with get_async_db() as db:
         # Для каждого пользователя
         for author_id, tests in tests_data.items():
             # Проверяем, существует ли автор
-            author_exists = (
-                db.query(UserStats).filter(UserStats.user_id == author_id).first()
+            author_exists = await db.scalar(
+                select(UserStats).where(UserStats.user_id == author_id)
             )
             author_username = (
                 author_exists.username if author_exists else f"User_{author_id}"
@@ -90,13 +114,11 @@ def save_custom_tests(tests_data):
             # Для каждого теста пользователя
             for test_data in tests:
                 # Проверяем, существует ли тест с таким именем у данного пользователя
-                existing_test = (
-                    db.query(CustomTest)
-                    .filter(
+                existing_test = await db.scalar(
+                    select(CustomTest).where(
                         CustomTest.author_id == author_id,
                         CustomTest.name == test_data["name"],
                     )
-                    .first()
                 )
 
                 if existing_test:
@@ -107,9 +129,11 @@ def save_custom_tests(tests_data):
                     )
 
                     # Удаляем существующие вопросы (они будут пересозданы)
-                    db.query(CustomQuestion).filter(
-                        CustomQuestion.test_id == existing_test.id
-                    ).delete()
+                    await db.execute(
+                        delete(CustomQuestion).where(
+                            CustomQuestion.test_id == existing_test.id
+                        )
+                    )
 
                     test_id = existing_test.id
                 else:
@@ -122,7 +146,7 @@ def save_custom_tests(tests_data):
                         ),
                     )
                     db.add(new_test)
-                    db.flush()  # Чтобы получить ID
+                    await db.flush()  # Чтобы получить ID
 
                     test_id = new_test.id
 
@@ -139,7 +163,7 @@ def save_custom_tests(tests_data):
                     )
                     db.add(new_question)
 
-        db.commit()
+        await db.commit()
 
 
 # Глобальный словарь для хранения всех кастомных тестов (user_id -> list of tests)
@@ -176,14 +200,10 @@ async def ask_test_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
     # Очищаем данные для нового вопроса
     context.user_data["current_question"] = {}
     
-    # Добавляем кнопку отмены
-    keyboard = [[InlineKeyboardButton("❌ Отменить создание", callback_data="cancel_test_creation")]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
     await update.message.reply_text(
         f"Название теста '{test_name}' принято.\n\n"
         "Теперь введите текст первого вопроса:",
-        reply_markup=reply_markup
+        reply_markup=CANCEL_CREATION_KEYBOARD
     )
     return ASK_QUESTION
 
@@ -199,13 +219,9 @@ async def ask_question(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
 
     context.user_data["current_question"]["text"] = question_text
     
-    # Добавляем кнопку отмены
-    keyboard = [[InlineKeyboardButton("❌ Отменить создание", callback_data="cancel_test_creation")]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
     await update.message.reply_text(
         "Вопрос принят. Теперь введите текст для первого варианта ответа (1️⃣):",
-        reply_markup=reply_markup
+        reply_markup=CANCEL_CREATION_KEYBOARD
     )
     return ASK_OPTION_1
 
@@ -221,13 +237,9 @@ async def ask_option_1(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
 
     context.user_data["current_question"]["option1"] = option1_text
     
-    # Добавляем кнопку отмены
-    keyboard = [[InlineKeyboardButton("❌ Отменить создание", callback_data="cancel_test_creation")]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
     await update.message.reply_text(
         "Вариант 1 принят. Введите текст для второго варианта ответа (2️⃣):",
-        reply_markup=reply_markup
+        reply_markup=CANCEL_CREATION_KEYBOARD
     )
     return ASK_OPTION_2
 
@@ -243,13 +255,9 @@ async def ask_option_2(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
 
     context.user_data["current_question"]["option2"] = option2_text
     
-    # Добавляем кнопку отмены
-    keyboard = [[InlineKeyboardButton("❌ Отменить создание", callback_data="cancel_test_creation")]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
     await update.message.reply_text(
         "Вариант 2 принят. Введите текст для третьего варианта ответа (3️⃣):",
-        reply_markup=reply_markup
+        reply_markup=CANCEL_CREATION_KEYBOARD
     )
     return ASK_OPTION_3
 
@@ -265,13 +273,9 @@ async def ask_option_3(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
 
     context.user_data["current_question"]["option3"] = option3_text
     
-    # Добавляем кнопку отмены
-    keyboard = [[InlineKeyboardButton("❌ Отменить создание", callback_data="cancel_test_creation")]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
     await update.message.reply_text(
         "Вариант 3 принят. Введите текст для четвертого варианта ответа (4️⃣):",
-        reply_markup=reply_markup
+        reply_markup=CANCEL_CREATION_KEYBOARD
     )
     return ASK_OPTION_4
 
@@ -287,13 +291,9 @@ async def ask_option_4(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
 
     context.user_data["current_question"]["option4"] = option4_text
     
-    # Добавляем кнопку отмены
-    keyboard = [[InlineKeyboardButton("❌ Отменить создание", callback_data="cancel_test_creation")]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
     await update.message.reply_text(
         "Вариант 4 принят. Теперь введите номер правильного варианта ответа (от 1 до 4):",
-        reply_markup=reply_markup
+        reply_markup=CANCEL_CREATION_KEYBOARD
     )
     return ASK_CORRECT_OPTION
 
@@ -336,6 +336,7 @@ async def ask_correct_option(update: Update, context: ContextTypes.DEFAULT_TYPE)
     return CONFIRM_ADD_QUESTION
 
 
+@unit_of_work
 async def confirm_add_question(
     update: Update, context: ContextTypes.DEFAULT_TYPE
 ) -> int:
@@ -390,7 +391,7 @@ async def finish_test_creation(
     custom_tests_storage[user_id].append(new_test_data)
 
     # Сохраняем все тесты в файл
-    save_custom_tests(custom_tests_storage)
+    await save_custom_tests(custom_tests_storage)
 
     await update.callback_query.edit_message_text(
         f"🎉 Тест '{new_test_data['name']}' успешно создан и сохранен! В нем {len(new_test_data['questions'])} вопросов.",
@@ -581,6 +582,7 @@ async def run_custom_test(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "correct_answers": 0,
             "total_questions": len(questions),
         }
+        TESTS_STARTED.inc("custom")
 
         await query.edit_message_text(
             f"📚 Начинаем кастомный тест '{test_name}'!\n"
@@ -628,35 +630,20 @@ async def send_custom_question(
 
     question_data = test_state["questions"][current_index]
 
-    # Формируем текст вопроса
-    question_text = (
-        f"❓ Вопрос {current_index + 1}/{total_questions}:\n\n"
-        f"{question_data['text']}\n\n"
-        f"Варианты ответов:\n"
-        f"1️⃣ {question_data['option1']}\n"
-        f"2️⃣ {question_data['option2']}\n"
-        f"3️⃣ {question_data['option3']}\n"
-        f"4️⃣ {question_data['option4']}"
+    question_text = custom_question_message(
+        question_data, current_index, total_questions
     )
 
-    # Формируем кнопки ответов
-    keyboard = [
-        [
-            InlineKeyboardButton("1️⃣", callback_data="custom_answer_1"),
-            InlineKeyboardButton("2️⃣", callback_data="custom_answer_2"),
-            InlineKeyboardButton("3️⃣", callback_data="custom_answer_3"),
-            InlineKeyboardButton("4️⃣", callback_data="custom_answer_4"),
-        ],
-        [InlineKeyboardButton("❌ Отменить тест", callback_data="cancel_custom_test")],
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-
     # Отправляем вопрос новым сообщением
     await context.bot.send_message(
-        chat_id=user_id, text=question_text, reply_markup=reply_markup
+        chat_id=user_id,
+        text=question_text,
+        reply_markup=CUSTOM_ANSWER_KEYBOARD,
+        rate_limit_args=PRIORITY_ANSWER,
     )
 
 
+@unit_of_work
 async def handle_custom_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обрабатывает ответ пользователя на вопрос кастомного теста."""
     query = update.callback_query
@@ -685,39 +672,12 @@ async def handle_custom_answer(update: Update, context: ContextTypes.DEFAULT_TYP
     correct_option = question_data["correct_option"]
     is_correct = selected_option == correct_option
 
-    # Формируем текст вопроса для обратной связи
-    total_questions = test_state["total_questions"]
-    question_text_feedback = (
-        f"❓ Вопрос {current_index + 1}/{total_questions}:\n\n"
-        f"{question_data['text']}\n\n"
-        f"Варианты ответов:\n"
-        f"1️⃣ {question_data['option1']}\n"
-        f"2️⃣ {question_data['option2']}\n"
-        f"3️⃣ {question_data['option3']}\n"
-        f"4️⃣ {question_data['option4']}"
-    )
-
-    # Формируем обратную связь
-    selected_answer_text = question_data.get(
-        f"option{selected_option}", "Неизвестный вариант"
+    # Текст вопроса с результатом ответа берется из кэша
+    feedback = custom_answer_feedback(
+        question_data, current_index, test_state["total_questions"], selected_option
     )
     if is_correct:
         test_state["correct_answers"] += 1
-        feedback = (
-            f"{question_text_feedback}\n\n"
-            "✅ Правильно!\n\n"
-            f"Ваш ответ: {selected_answer_text}"
-        )
-    else:
-        correct_answer_text = question_data.get(
-            f"option{correct_option}", "Неизвестный вариант"
-        )
-        feedback = (
-            f"{question_text_feedback}\n\n"
-            "❌ Неправильно!\n\n"
-            f"Ваш ответ: {selected_answer_text}\n"
-            f"Правильный ответ: {correct_answer_text}"
-        )
 
     # Обновляем сообщение с вопросом, убирая кнопки и показывая результат
     await query.edit_message_text(text=feedback, reply_markup=None)
@@ -741,6 +701,7 @@ async def finish_custom_test(
     correct_answers = test_state["correct_answers"]
     total_questions = test_state["total_questions"]
     test_name = test_state["name"]
+    TESTS_FINISHED.inc("custom")
     username = update.effective_user.username or f"User_{user_id}"
 
     percentage = (correct_answers / total_questions) * 100 if total_questions > 0 else 0
@@ -751,37 +712,36 @@ async def finish_custom_test(
     old_mmr = 0
     stats_text = ""
     try:
-        with get_db() as db:
-            stats = db.query(UserStats).filter(UserStats.user_id == user_id).first()
-            if not stats:
-                # Создаем статистику, если ее нет
-                stats = UserStats(user_id=user_id, username=username)
-                db.add(stats)
-                db.flush()  # Получаем ID и начальный MMR
-
-            if stats:
-                old_mmr = stats.mmr
-                mmr_change = stats.calculate_mmr_change_custom(
-                    correct_answers, total_questions
-                )
-                stats.mmr = max(
-                    0, stats.mmr + mmr_change
-                )  # MMR не может быть отрицательным
-                stats.total_tests += 1
-                stats.last_test_date = datetime.utcnow()
-                stats.username = username  # Обновляем имя пользователя на всякий случай
-                new_mmr = stats.mmr
-                db.commit()
-
-                # Формируем текст об изменении MMR
-                mmr_symbol = (
-                    "🔺" if mmr_change > 0 else "🔻" if mmr_change < 0 else "➖"
-                )
-                stats_text = f"\n\n📊 Статистика:\nMMR: {old_mmr} {mmr_symbol} {abs(mmr_change)} = {new_mmr}"
-            else:
-                logging.error(
-                    f"Не удалось найти или создать статистику для user_id={user_id}"
-                )
+        async with get_async_db() as db, write_transaction(db):
+            # Создаем статистику, если ее нет (и обновляем имя пользователя)
+            await ensure_user_stats(db, user_id, username)
+
+            # Изменение MMR считается внутри одного UPDATE по текущему
+            # значению в БД (MMR не может быть отрицательным)
+            applied = await apply_mmr_result(
+                db,
+                user_id,
+                UserStats.mmr,
+                UserStats.total_tests,
+                UserStats.mmr_change_expression(
+                    UserStats.base_mmr_change_custom(correct_answers, total_questions),
+                    -75,
+                    100,
+                ),
+            )
+
+        if applied:
+            old_mmr = applied["old_mmr"]
+            mmr_change = applied["mmr_change"]
+            new_mmr = applied["new_mmr"]
+
+            # Формируем текст об изменении MMR
+            mmr_symbol = "🔺" if mmr_change > 0 else "🔻" if mmr_change < 0 else "➖"
+            stats_text = f"\n\n📊 Статистика:\nMMR: {old_mmr} {mmr_symbol} {abs(mmr_change)} = {new_mmr}"
+        else:
+            logging.error(
+                f"Не удалось найти или создать статистику для user_id={user_id}"
+            )
 
     except Exception as e:
         logging.error(f"Ошибка при обновлении MMR для user_id={user_id}: {e}")
@@ -827,6 +787,7 @@ async def finish_custom_test(
             chat_id=user_id,
             text="Выберите дальнейшее действие:",
             reply_markup=reply_markup,
+            rate_limit_args=PRIORITY_NOTIFICATION,
         )
 
     except Exception as e:
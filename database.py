@@ -1,5 +1,12 @@
+import asyncio
+import functools
+import logging
+import os
+import weakref
+from contextvars import ContextVar
 from sqlalchemy import (
     create_engine,
+    event,
     Column,
     Integer,
     String,
@@ -7,45 +14,107 @@ from sqlalchemy import (
     Float,
     DateTime,
     ForeignKey,
+    Index,
+    case,
+    func,
+    literal,
+    select,
+    update,
 )
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
-from contextlib import contextmanager
+from contextlib import contextmanager, asynccontextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
 
 Base = declarative_base()
 
 
 class Question(Base):
     __tablename__ = "questions"
+    # Вопросы уровней при заполнении банка (seed), действующие первыми
+    __table_args__ = (Index("ix_questions_level_retired", "level", "retired"),)
 
     id = Column(Integer, primary_key=True)
-    level = Column(String, nullable=False)  
+    level = Column(String, nullable=False)
     question_text = Column(String, nullable=False)
     option1 = Column(String, nullable=False)
     option2 = Column(String, nullable=False)
     option3 = Column(String, nullable=False)
     option4 = Column(String, nullable=False)
     correct_option = Column(Integer, nullable=False)  # 1-4
+    # Хэш содержимого вопроса: по нему при заполнении находятся измененные вопросы
+    content_hash = Column(String, nullable=True)
+    # Вопрос убран из банка: в новые тесты не попадает, но остается в БД
+    # для начатых тестов, в которых он уже выбран
+    retired = Column(Boolean, nullable=False, default=False, server_default="0")
+
+
+class BankMeta(Base):
+    """Служебные значения банка вопросов (например, версия вопросов языка)"""
+
+    __tablename__ = "bank_meta"
+
+    key = Column(String, primary_key=True)
+    value = Column(String, nullable=False)
 
 
 class UserProgress(Base):
     __tablename__ = "user_progress"
 
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False, unique=True, index=True)
     level = Column(String, nullable=False)
     current_question = Column(Integer, default=0)
     correct_answers = Column(Integer, default=0)
     is_testing = Column(Boolean, default=False)
     last_answer_time = Column(DateTime, default=datetime.utcnow)
+    # Устаревшее поле: вопросы теста хранятся в session_questions,
+    # колонка оставлена только для миграции старых баз
     question_ids = Column(
         String, nullable=True
-    )  
+    )
+
+    # Вопросы и ответы текущего теста
+    answers = relationship(
+        "SessionQuestion",
+        back_populates="session",
+        cascade="all, delete-orphan",
+        order_by="SessionQuestion.position",
+    )
+
+
+class SessionQuestion(Base):
+    """Вопрос теста на своей позиции и ответ пользователя на него"""
+
+    __tablename__ = "session_questions"
+    __table_args__ = (
+        Index(
+            "ix_session_questions_session_position",
+            "session_id",
+            "position",
+            unique=True,
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
+    session_id = Column(Integer, ForeignKey("user_progress.id"), nullable=False)
+    position = Column(Integer, nullable=False)  # 0-9
+    question_id = Column(Integer, ForeignKey("questions.id"), nullable=False)
+    chosen_option = Column(Integer, nullable=True)  # 1-4, пока нет ответа - None
+    is_correct = Column(Boolean, nullable=True)
+    answered_at = Column(DateTime, nullable=True)
+
+    session = relationship("UserProgress", back_populates="answers")
 
 
 class UserStats(Base):
     __tablename__ = "user_stats"
+
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, unique=True)
     username = Column(String)
@@ -58,10 +127,13 @@ class UserStats(Base):
     total_tests_python = Column(Integer, default=0)
     total_tests_java = Column(Integer, default=0)
     total_tests_sql = Column(Integer, default=0)
+    # Фактическое изменение MMR за последний тест. Записывается тем же UPDATE,
+    # что и MMR, и позволяет получить старое значение через RETURNING
+    last_mmr_change = Column(Integer, default=0)
 
-    def calculate_mmr_change(
-        self, correct_answers: int, difficulty_level: str, opponent_mmr: int = 1500
-    ):
+    @staticmethod
+    def base_mmr_change(correct_answers: int, difficulty_level: str):
+        """Изменение MMR за стандартный тест до поправок на текущий MMR."""
         # Базовые очки за каждый правильный ответ
         base_points = 25
 
@@ -99,6 +171,13 @@ class UserStats(Base):
         else:  # Отличный результат
             mmr_change = int(50 * level_multiplier)  # Большая награда
 
+        return mmr_change
+
+    def calculate_mmr_change(
+        self, correct_answers: int, difficulty_level: str, opponent_mmr: int = 1500
+    ):
+        mmr_change = self.base_mmr_change(correct_answers, difficulty_level)
+
         # Дополнительный множитель для защиты новичков
         if self.mmr < 800:  # Защита новичков от больших потерь
             if mmr_change < 0:
@@ -112,8 +191,9 @@ class UserStats(Base):
 
         return mmr_change
 
-    def calculate_mmr_change_custom(self, correct_answers: int, total_questions: int):
-        """Рассчитывает изменение MMR для кастомного теста."""
+    @staticmethod
+    def base_mmr_change_custom(correct_answers: int, total_questions: int):
+        """Изменение MMR за кастомный тест до поправок на текущий MMR."""
         if total_questions == 0:
             return 0  # Нет вопросов - нет изменения MMR
 
@@ -131,6 +211,12 @@ class UserStats(Base):
         else:
             mmr_change = 40
 
+        return mmr_change
+
+    def calculate_mmr_change_custom(self, correct_answers: int, total_questions: int):
+        """Рассчитывает изменение MMR для кастомного теста."""
+        mmr_change = self.base_mmr_change_custom(correct_answers, total_questions)
+
         # Применяем общие правила (защита новичков, штрафы для опытных)
         if self.mmr < 800:
             if mmr_change < 0:
@@ -146,9 +232,26 @@ class UserStats(Base):
 
         return mmr_change
 
+    @staticmethod
+    def mmr_change_expression(base_change: int, lower: int, upper: int):
+        """SQL-выражение изменения MMR по текущему значению UserStats.mmr.
+
+        Те же правила, что в calculate_mmr_change: защита новичков, строже
+        для опытных и ограничение рамками [lower, upper]. Так изменение
+        вычисляется внутри UPDATE, без чтения строки в Python.
+        """
+        if base_change >= 0:
+            return literal(min(base_change, upper))
+        return case(
+            (UserStats.mmr < 800, max(int(base_change * 0.5), lower)),
+            (UserStats.mmr > 2000, max(int(base_change * 1.5), lower)),
+            else_=max(base_change, lower),
+        )
+
 
 class CustomTest(Base):
     __tablename__ = "custom_tests"
+    __table_args__ = (Index("ix_custom_tests_author_name", "author_id", "name"),)
 
     id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
@@ -158,7 +261,10 @@ class CustomTest(Base):
 
     # Связь с вопросами
     questions = relationship(
-        "CustomQuestion", back_populates="test", cascade="all, delete-orphan"
+        "CustomQuestion",
+        back_populates="test",
+        cascade="all, delete-orphan",
+        order_by="CustomQuestion.id",
     )
 
 
@@ -166,7 +272,9 @@ class CustomQuestion(Base):
     __tablename__ = "custom_questions"
 
     id = Column(Integer, primary_key=True)
-    test_id = Column(Integer, ForeignKey("custom_tests.id"), nullable=False)
+    test_id = Column(
+        Integer, ForeignKey("custom_tests.id"), nullable=False, index=True
+    )
     question_text = Column(String, nullable=False)
     option1 = Column(String, nullable=False)
     option2 = Column(String, nullable=False)
@@ -178,14 +286,243 @@ class CustomQuestion(Base):
     test = relationship("CustomTest", back_populates="questions")
 
 
+# --- Настройки SQLite ---
+# Путь к файлу базы и профиль PRAGMA задаются переменными окружения:
+#   DB_PATH     - файл базы (по умолчанию asu_quiz.db)
+#   DB_PROFILE  - "tuned" (по умолчанию) или "default" (настройки SQLite как есть)
+#   DB_JOURNAL_MODE, DB_SYNCHRONOUS, DB_BUSY_TIMEOUT_MS, DB_CACHE_SIZE,
+#   DB_MMAP_SIZE - переопределяют отдельные значения выбранного профиля
+DB_PATH = os.getenv("DB_PATH", "asu_quiz.db")
+
+SQLITE_PROFILES = {
+    "default": {},
+    "tuned": {
+        # WAL: читатели не блокируют писателя, коммит без перезаписи журнала
+        "journal_mode": "WAL",
+        # В режиме WAL NORMAL безопасен для целостности, fsync только на checkpoint
+        "synchronous": "NORMAL",
+        # Ждем освобождения блокировки вместо ошибки "database is locked"
+        "busy_timeout": 5000,
+        # Отрицательное значение - размер кэша в КиБ (16 МиБ)
+        "cache_size": -16000,
+        "mmap_size": 256 * 1024 * 1024,
+    },
+}
+
+_PRAGMA_ENV = {
+    "journal_mode": "DB_JOURNAL_MODE",
+    "synchronous": "DB_SYNCHRONOUS",
+    "busy_timeout": "DB_BUSY_TIMEOUT_MS",
+    "cache_size": "DB_CACHE_SIZE",
+    "mmap_size": "DB_MMAP_SIZE",
+}
+
+
+def get_sqlite_pragmas(profile=None):
+    """Возвращает PRAGMA выбранного профиля с учетом переопределений из окружения"""
+    profile = profile or os.getenv("DB_PROFILE", "tuned")
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Неизвестный профиль SQLite: {profile}")
+    pragmas = dict(SQLITE_PROFILES[profile])
+    for name, env_name in _PRAGMA_ENV.items():
+        value = os.getenv(env_name)
+        if value:
+            pragmas[name] = value
+    return pragmas
+
+
+def configure_sqlite(sync_engine, pragmas):
+    """Выполняет PRAGMA на каждом новом соединении engine"""
+
+    @event.listens_for(sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def make_engine(path=DB_PATH, profile=None):
+    """Создает синхронный engine для файла базы с настройками профиля"""
+    sync_engine = create_engine(f"sqlite:///{path}")
+    configure_sqlite(sync_engine, get_sqlite_pragmas(profile))
+    return sync_engine
+
+
+def make_async_engine(path=DB_PATH, profile=None):
+    """Создает асинхронный (aiosqlite) engine с настройками профиля"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    configure_sqlite(engine.sync_engine, get_sqlite_pragmas(profile))
+    return engine
+
+
 # Создаем подключение к базе данных
-engine = create_engine("sqlite:///asu_quiz.db")
+engine = make_engine()
 SessionLocal = sessionmaker(bind=engine)
 
+# Асинхронное подключение (aiosqlite) для обработчиков бота, чтобы работа с БД
+# не блокировала цикл событий. Синхронный engine остается для создания таблиц
+# и заполнения вопросами при старте.
+async_engine = make_async_engine()
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+
+# --- Миграции схемы ---
+# Версия схемы хранится в PRAGMA user_version, поэтому существующую базу
+# asu_quiz.db можно обновить на месте, не пересоздавая ее.
+
+
+def _table_columns(connection, table_name):
+    rows = connection.exec_driver_sql(f"PRAGMA table_info({table_name})")
+    return {row[1] for row in rows}
+
+
+def _migration_hot_lookup_indexes(connection):
+    """Индексы для частых выборок (прогресс, вопросы, рейтинг, тесты)."""
+    # Перед уникальным индексом оставляем только последний прогресс пользователя
+    connection.exec_driver_sql(
+        "DELETE FROM user_progress WHERE id NOT IN "
+        "(SELECT MAX(id) FROM user_progress GROUP BY user_id)"
+    )
+    for table in (
+        UserProgress.__table__,
+        Question.__table__,
+        UserStats.__table__,
+        CustomTest.__table__,
+    ):
+        columns = _table_columns(connection, table.name)
+        for index in table.indexes:
+            # Индексы по колонкам из более поздних миграций создают они сами
+            if all(column.name in columns for column in index.columns):
+                index.create(connection, checkfirst=True)
+
+
+def _migration_session_questions(connection):
+    """Переносит CSV-строку user_progress.question_ids в session_questions."""
+    SessionQuestion.__table__.create(connection, checkfirst=True)
+    rows = connection.exec_driver_sql(
+        "SELECT id, question_ids FROM user_progress "
+        "WHERE question_ids IS NOT NULL AND question_ids != ''"
+    ).fetchall()
+    records = [
+        {"session_id": session_id, "position": position, "question_id": int(qid)}
+        for session_id, question_ids in rows
+        for position, qid in enumerate(question_ids.split(","))
+    ]
+    if records:
+        connection.execute(SessionQuestion.__table__.insert(), records)
+    connection.exec_driver_sql("UPDATE user_progress SET question_ids = NULL")
+
+
+def _migration_last_mmr_change(connection):
+    """Колонка user_stats.last_mmr_change для атомарного обновления MMR."""
+    columns = {
+        row[1] for row in connection.exec_driver_sql("PRAGMA table_info(user_stats)")
+    }
+    if "last_mmr_change" not in columns:
+        connection.exec_driver_sql(
+            "ALTER TABLE user_stats ADD COLUMN last_mmr_change INTEGER DEFAULT 0"
+        )
+
+
+def _migration_question_content_hash(connection):
+    """Колонка questions.content_hash для инкрементального заполнения банка."""
+    columns = {
+        row[1] for row in connection.exec_driver_sql("PRAGMA table_info(questions)")
+    }
+    if "content_hash" not in columns:
+        connection.exec_driver_sql(
+            "ALTER TABLE questions ADD COLUMN content_hash VARCHAR"
+        )
+    BankMeta.__table__.create(connection, checkfirst=True)
+
+
+def _migration_custom_question_test_index(connection):
+    """Индекс custom_questions.test_id для загрузки вопросов тестов."""
+    for index in CustomQuestion.__table__.indexes:
+        index.create(connection, checkfirst=True)
+
+
+def _migration_question_retired(connection):
+    """Колонка questions.retired: убранные из банка вопросы не удаляются."""
+    if "retired" not in _table_columns(connection, "questions"):
+        connection.exec_driver_sql(
+            "ALTER TABLE questions ADD COLUMN retired BOOLEAN NOT NULL DEFAULT 0"
+        )
+    for index in Question.__table__.indexes:
+        index.create(connection, checkfirst=True)
+
+
+def _migration_drop_unused_indexes(connection):
+    """Удаляет индексы, которые не использует ни один запрос.
+
+    Рейтинги таблицы лидеров строятся в памяти одним проходом по user_stats,
+    а ix_questions_level - префикс ix_questions_level_retired.
+    """
+    for name in (
+        "ix_user_stats_rank_python",
+        "ix_user_stats_rank_java",
+        "ix_user_stats_rank_sql",
+        "ix_questions_level",
+    ):
+        connection.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+
+
+MIGRATIONS = [
+    _migration_hot_lookup_indexes,
+    _migration_session_questions,
+    _migration_last_mmr_change,
+    _migration_question_content_hash,
+    _migration_custom_question_test_index,
+    _migration_question_retired,
+    _migration_drop_unused_indexes,
+]
+
+
+def upgrade_schema():
+    """Применяет к базе миграции, которые еще не были выполнены"""
+    with engine.begin() as connection:
+        version = connection.exec_driver_sql("PRAGMA user_version").scalar()
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            migration(connection)
+            connection.exec_driver_sql(f"PRAGMA user_version = {number}")
+
+
+def enable_incremental_vacuum(convert_existing=False):
+    """Включает auto_vacuum=INCREMENTAL, чтобы файл базы можно было сжимать.
+
+    Режим применяется VACUUM (вне транзакции). Для новой базы без таблиц
+    он ничего не стоит. Существующую базу VACUUM перестраивает целиком и все
+    это время держит блокировку записи, поэтому при запуске бота она не
+    переводится (convert_existing=True передает разовый запуск
+    python maintenance.py).
+    """
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        if connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2:
+            return
+        connection.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+        has_tables = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master LIMIT 1"
+        ).first()
+        if not has_tables:
+            connection.exec_driver_sql("VACUUM")
+            return
+        if not convert_existing:
+            logging.warning(
+                "В базе не включен auto_vacuum=INCREMENTAL, свободные страницы "
+                "не возвращаются файлу. Для перевода базы (полный VACUUM) "
+                "выполните python maintenance.py"
+            )
+            return
+        logging.info("Перевод базы в auto_vacuum=INCREMENTAL: полный VACUUM")
+        connection.exec_driver_sql("VACUUM")
+
 
 # Создаем таблицы
 def create_tables():
+    enable_incremental_vacuum()
     Base.metadata.create_all(engine)
+    upgrade_schema()
 
 
 @contextmanager
@@ -195,3 +532,156 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Сессия текущего обновления Telegram (см. unit_of_work)
+_update_session = ContextVar("update_session", default=None)
+
+
+@asynccontextmanager
+async def get_async_db():
+    """Асинхронный аналог get_db для использования в обработчиках бота.
+
+    Внутри обработчика, обернутого в unit_of_work, возвращает общую сессию
+    обновления, поэтому вложенные вызовы не открывают новых сессий.
+    """
+    db = _update_session.get()
+    if db is not None:
+        yield db
+        return
+    db = AsyncSessionLocal()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+def unit_of_work(handler):
+    """Декоратор обработчика: одна сессия и одна транзакция на обновление.
+
+    Все get_async_db() в цепочке вызовов обработчика используют одну сессию.
+    Незафиксированные изменения коммитятся после обработчика, при ошибке
+    транзакция откатывается. Блокировка записи SQLite берется с первого
+    изменения и держится до коммита, поэтому обработчик сначала выполняет
+    чтения, а изменения - подряд в блоке write_transaction.
+    """
+
+    @functools.wraps(handler)
+    async def wrapper(*args, **kwargs):
+        if _update_session.get() is not None:
+            return await handler(*args, **kwargs)
+        async with AsyncSessionLocal() as db:
+            token = _update_session.set(db)
+            try:
+                result = await handler(*args, **kwargs)
+                await db.commit()
+                return result
+            except Exception:
+                await db.rollback()
+                raise
+            finally:
+                _update_session.reset(token)
+
+    return wrapper
+
+
+# Писатели процесса ждут друг друга в очереди asyncio (FIFO, без задержки
+# на пробуждение), а не в busy_timeout SQLite, который опрашивает
+# блокировку с паузами до 100 мс. Очередь своя у каждого event loop:
+# asyncio.Lock нельзя ждать из другого loop
+_write_locks = weakref.WeakKeyDictionary()
+
+
+def writer_queue():
+    """Очередь писателей текущего цикла событий (asyncio.Lock).
+
+    Ее берет write_transaction; напрямую - только записи, которые не могут
+    идти через сессию (incremental_vacuum в maintenance.py).
+    """
+    loop = asyncio.get_running_loop()
+    lock = _write_locks.get(loop)
+    if lock is None:
+        lock = _write_locks[loop] = asyncio.Lock()
+    return lock
+
+
+@asynccontextmanager
+async def write_transaction(db):
+    """Транзакция записи сессии db: очередь писателей, BEGIN IMMEDIATE, коммит.
+
+    sqlite3 сам открывает транзакцию (BEGIN DEFERRED) только перед первым
+    изменением, поэтому чтения до блока выполняются без блокировки записи.
+    Внутри блока - только изменения, подряд: блокировка держится от BEGIN
+    IMMEDIATE до коммита при выходе из блока (при ошибке - откат).
+    """
+    async with writer_queue():
+        connection = await db.connection()
+        raw_connection = await connection.get_raw_connection()
+        if not raw_connection.driver_connection.in_transaction:
+            await connection.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            yield db
+            await db.commit()
+        except BaseException:
+            await db.rollback()
+            raise
+
+
+async def ensure_user_stats(db, user_id, username):
+    """Создает статистику пользователя, если ее нет, и обновляет username.
+
+    Один INSERT ... ON CONFLICT DO UPDATE вместо SELECT + INSERT: нет лишнего
+    запроса и нет гонки на уникальном user_id при одновременных вызовах.
+    """
+    statement = sqlite_insert(UserStats).values(user_id=user_id, username=username)
+    await db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[UserStats.user_id],
+            set_={"username": statement.excluded.username},
+        )
+    )
+
+
+async def apply_mmr_result(db, user_id, mmr_column, tests_column, mmr_change, **values):
+    """Атомарно применяет результат теста к статистике одним UPDATE ... RETURNING.
+
+    mmr_column/tests_column - колонки UserStats (например, UserStats.mmr_java),
+    mmr_change - число или выражение (см. UserStats.mmr_change_expression).
+    MMR не опускается ниже нуля. Все выражения вычисляются по значениям до
+    обновления, поэтому параллельные результаты одного пользователя не теряются.
+    Возвращает словарь со старым и новым MMR или None, если статистики нет.
+    """
+    new_mmr = func.max(0, mmr_column + mmr_change)
+    statement = (
+        update(UserStats)
+        .where(UserStats.user_id == user_id)
+        .values(
+            {
+                mmr_column: new_mmr,
+                UserStats.last_mmr_change: new_mmr - mmr_column,
+                tests_column: tests_column + 1,
+                UserStats.last_test_date: datetime.utcnow(),
+                **{getattr(UserStats, name): value for name, value in values.items()},
+            }
+        )
+        .returning(
+            mmr_column, UserStats.last_mmr_change, tests_column, UserStats.username
+        )
+        .execution_options(synchronize_session=False)
+    )
+    row = (await db.execute(statement)).first()
+    if row is None:
+        return None
+    mmr, applied_change, total_tests, username = row
+    return {
+        "old_mmr": mmr - applied_change,
+        "new_mmr": mmr,
+        "mmr_change": applied_change,
+        "total_tests": total_tests,
+        "username": username,
+    }
+
+
+if __name__ == "__main__":
+    # Обновление существующей базы: python database.py
+    create_tables()
@@ -0,0 +1,124 @@
+"""Таблица лидеров в памяти.
+
+Для каждого языка хранится отсортированный список ключей (-mmr, user_id):
+топ-N - это срез списка, место пользователя находится бинарным поиском.
+Рейтинг строится из user_stats при старте (одна сортировка всех ключей) и
+обновляется после каждого завершенного теста (insort одного ключа), поэтому
+просмотр таблицы лидеров не обращается к БД.
+"""
+
+import logging
+from bisect import bisect_left, insort
+from typing import NamedTuple
+
+from sqlalchemy import select
+
+from database import get_db, UserStats
+
+LANGUAGES = ("python", "java", "sql")
+
+
+class LeaderboardEntry(NamedTuple):
+    user_id: int
+    username: str
+    mmr: int
+    total_tests: int
+
+
+class LanguageRanking:
+    """Рейтинг одного языка (только пользователи с пройденными тестами)"""
+
+    def __init__(self):
+        self._keys = []
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    @classmethod
+    def from_entries(cls, entries):
+        """Строит рейтинг из LeaderboardEntry всех участников.
+
+        Ключи сортируются один раз: вставка каждого через insort сдвигает
+        список и при загрузке всей таблицы обходится в O(n^2).
+        """
+        ranking = cls()
+        ranking._entries = {
+            entry.user_id: entry for entry in entries if entry.total_tests > 0
+        }
+        ranking._keys = sorted(
+            (-entry.mmr, entry.user_id) for entry in ranking._entries.values()
+        )
+        return ranking
+
+    def update(self, user_id, username, mmr, total_tests):
+        """Добавляет пользователя или меняет его MMR и число тестов"""
+        old = self._entries.pop(user_id, None)
+        if old is not None:
+            del self._keys[bisect_left(self._keys, (-old.mmr, user_id))]
+        if total_tests > 0:
+            self._entries[user_id] = LeaderboardEntry(
+                user_id, username, mmr, total_tests
+            )
+            insort(self._keys, (-mmr, user_id))
+
+    def top(self, n):
+        """Первые n участников по убыванию MMR"""
+        return [self._entries[user_id] for _, user_id in self._keys[:n]]
+
+    def rank(self, user_id):
+        """Возвращает (место, всего участников) или None, если пользователя нет.
+
+        Пользователи с одинаковым MMR делят одно место.
+        """
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        return bisect_left(self._keys, (-entry.mmr,)) + 1, len(self._keys)
+
+
+class Leaderboard:
+    """Рейтинги по всем языкам"""
+
+    def __init__(self):
+        self._rankings = {lang: LanguageRanking() for lang in LANGUAGES}
+
+    def load(self):
+        """Строит рейтинги по данным user_stats (синхронно, при старте)"""
+        entries = {lang: [] for lang in LANGUAGES}
+        with get_db() as db:
+            columns = [UserStats.user_id, UserStats.username]
+            for lang in LANGUAGES:
+                columns.append(getattr(UserStats, f"mmr_{lang}"))
+                columns.append(getattr(UserStats, f"total_tests_{lang}"))
+            # Запрос Core через соединение: без обработки строк сессией ORM
+            for row in db.connection().execute(select(*columns)):
+                user_id, username = row[0], row[1]
+                for i, lang in enumerate(LANGUAGES):
+                    mmr, total_tests = row[2 + 2 * i], row[3 + 2 * i]
+                    if total_tests:
+                        entries[lang].append(
+                            LeaderboardEntry(user_id, username, mmr, total_tests)
+                        )
+        rankings = {
+            lang: LanguageRanking.from_entries(lang_entries)
+            for lang, lang_entries in entries.items()
+        }
+        self._rankings = rankings
+        logging.info(
+            "Таблица лидеров загружена: "
+            + ", ".join(f"{lang}={len(r)}" for lang, r in rankings.items())
+        )
+
+    def update(self, lang, user_id, username, mmr, total_tests):
+        self._rankings[lang].update(user_id, username, mmr, total_tests)
+
+    def top(self, lang, n=5):
+        return self._rankings[lang].top(n)
+
+    def rank(self, lang, user_id):
+        return self._rankings[lang].rank(user_id)
+
+
+# Глобальная таблица лидеров
+leaderboard = Leaderboard()
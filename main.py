@@ -1,16 +1,13 @@
 from database import create_tables
-from java_questions import add_java_questions
-from python_questions import add_python_questions
-from sql_questions import add_sql_questions
+from seed import seed_question_bank
 
 if __name__ == "__main__":
     # Создаем таблицы
     create_tables()
 
-    # Добавляем вопросы (если их нет в БД)
-    add_java_questions()
-    add_python_questions()
-    add_sql_questions()
+    # Добавляем новые и измененные вопросы из data/questions
+    # (если файлы не менялись - только сверка версий)
+    seed_question_bank()
 
     # Импортируем и запускаем бота только после создания таблиц
     from bot import main
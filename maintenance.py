@@ -0,0 +1,144 @@
+"""Периодическое обслуживание базы данных.
+
+Задача запускается из очереди задач приложения (job_queue) и:
+- удаляет завершенные и отмененные тесты (user_progress с is_testing=False
+  и их session_questions) старше PROGRESS_RETENTION_DAYS дней - небольшими
+  пачками, каждая в своей короткой транзакции в общей очереди писателей,
+  чтобы не задерживать обработчики;
+- обновляет статистику планировщика (ANALYZE с ограничением analysis_limit);
+- возвращает свободные страницы файлу (PRAGMA incremental_vacuum).
+
+Разовый запуск вручную: python maintenance.py. Он же переводит существующую
+базу в auto_vacuum=INCREMENTAL (полный VACUUM), если это еще не сделано.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select
+
+from database import (
+    AsyncSessionLocal,
+    async_engine,
+    SessionQuestion,
+    UserProgress,
+    enable_incremental_vacuum,
+    write_transaction,
+    writer_queue,
+)
+
+# Сколько дней хранить завершенные тесты
+PROGRESS_RETENTION_DAYS = int(os.getenv("PROGRESS_RETENTION_DAYS", "30"))
+# Как часто запускать обслуживание (часы)
+MAINTENANCE_INTERVAL_HOURS = float(os.getenv("MAINTENANCE_INTERVAL_HOURS", "24"))
+# Сколько тестов удалять за одну транзакцию
+MAINTENANCE_BATCH_SIZE = int(os.getenv("MAINTENANCE_BATCH_SIZE", "500"))
+# Сколько страниц возвращать файлу за одну транзакцию incremental_vacuum
+VACUUM_PAGES_PER_STEP = 1000
+
+
+async def prune_finished_progress(
+    retention_days=PROGRESS_RETENTION_DAYS, batch_size=MAINTENANCE_BATCH_SIZE
+):
+    """Удаляет завершенные тесты старше retention_days. Возвращает число тестов"""
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    removed = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            ids = (
+                await db.scalars(
+                    select(UserProgress.id)
+                    .where(
+                        UserProgress.is_testing == False,  # noqa: E712
+                        UserProgress.last_answer_time < cutoff,
+                    )
+                    .limit(batch_size)
+                )
+            ).all()
+            if not ids:
+                break
+            async with write_transaction(db):
+                await db.execute(
+                    delete(SessionQuestion).where(SessionQuestion.session_id.in_(ids))
+                )
+                await db.execute(delete(UserProgress).where(UserProgress.id.in_(ids)))
+        removed += len(ids)
+        if len(ids) < batch_size:
+            break
+        # Даем обработчикам обновлений выполниться между пачками
+        await asyncio.sleep(0)
+    return removed
+
+
+async def _database_size(connection):
+    page_size = (await connection.exec_driver_sql("PRAGMA page_size")).scalar()
+    page_count = (await connection.exec_driver_sql("PRAGMA page_count")).scalar()
+    freelist = (await connection.exec_driver_sql("PRAGMA freelist_count")).scalar()
+    return page_size * page_count, freelist
+
+
+async def compact_database():
+    """ANALYZE и incremental_vacuum. Возвращает число освобожденных байт"""
+    async with async_engine.connect() as connection:
+        size_before, freelist = await _database_size(connection)
+
+        # Ограниченный ANALYZE: статистика по выборке, а не по всем строкам
+        await connection.exec_driver_sql("PRAGMA analysis_limit = 1000")
+        async with writer_queue():
+            await connection.exec_driver_sql("ANALYZE")
+            await connection.commit()
+
+        # Возвращаем свободные страницы частями по VACUUM_PAGES_PER_STEP,
+        # каждая часть - своя короткая транзакция. incremental_vacuum
+        # освобождает одну страницу на шаг выполнения оператора, а
+        # exec_driver_sql делает только первый шаг; executescript выполняет
+        # оператор до конца. executescript сам коммитит открытую транзакцию,
+        # поэтому шаг не может идти через write_transaction и берет очередь
+        # писателей напрямую
+        raw_connection = await connection.get_raw_connection()
+        while freelist > 0:
+            async with writer_queue():
+                await raw_connection.driver_connection.executescript(
+                    "BEGIN IMMEDIATE;"
+                    f"PRAGMA incremental_vacuum({VACUUM_PAGES_PER_STEP});"
+                    "COMMIT;"
+                )
+            _, remaining = await _database_size(connection)
+            if remaining >= freelist:
+                break
+            freelist = remaining
+            await asyncio.sleep(0)
+        await connection.commit()
+
+        size_after, _ = await _database_size(connection)
+    return size_before - size_after
+
+
+async def run_maintenance(context=None):
+    """Задача job_queue: очистка старых тестов и сжатие базы"""
+    started = time.perf_counter()
+    try:
+        removed = await prune_finished_progress()
+        reclaimed = await compact_database()
+    except Exception as e:
+        logging.error(f"Ошибка при обслуживании базы данных: {e}")
+        return None
+    elapsed = time.perf_counter() - started
+    logging.info(
+        f"Обслуживание БД: удалено завершенных тестов: {removed}, "
+        f"освобождено {reclaimed / 1024:.1f} КиБ за {elapsed:.2f} с"
+    )
+    return {"progress_removed": removed, "bytes_reclaimed": reclaimed}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        level=logging.INFO,
+    )
+    # Существующая база без auto_vacuum=INCREMENTAL переводится только здесь
+    enable_incremental_vacuum(convert_existing=True)
+    asyncio.run(run_maintenance())
@@ -0,0 +1,337 @@
+"""Метрики процесса бота в текстовом формате Prometheus.
+
+Если задан METRICS_PORT, бот поднимает HTTP-сервер на METRICS_LISTEN:METRICS_PORT
+и отдает метрики по GET /metrics:
+
+- quiz_bot_handler_duration_seconds{handler, pattern} - время обработчиков
+  (гистограмма), quiz_bot_handler_errors_total - исключения в обработчиках;
+- quiz_bot_tests_started_total / quiz_bot_tests_finished_total{level} -
+  начатые и завершенные тесты по уровням (level="custom" - пользовательские);
+- quiz_bot_telegram_api_duration_seconds{method} и
+  quiz_bot_telegram_api_errors_total{method, code} - запросы к Bot API
+  (через планировщик send_scheduler, getUpdates не учитывается);
+- quiz_bot_db_query_duration_seconds{operation} - SQL-запросы (число
+  запросов - счетчик _count гистограммы);
+- quiz_bot_active_sessions, quiz_bot_send_queue_depth - текущие значения.
+
+Без METRICS_PORT обработчики, engine и планировщик не оборачиваются, а
+счетчики тестов - это только увеличение значения в словаре.
+"""
+
+import asyncio
+import inspect
+import logging
+import os
+import time
+from bisect import bisect_left
+
+from sqlalchemy import event
+from telegram.error import (
+    BadRequest,
+    ChatMigrated,
+    Conflict,
+    Forbidden,
+    InvalidToken,
+    NetworkError,
+    RetryAfter,
+    TimedOut,
+)
+
+from update_processing import wrap_handler_callbacks
+
+# 0 - метрики выключены
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_LISTEN = os.getenv("METRICS_LISTEN", "127.0.0.1")
+METRICS_ENABLED = METRICS_PORT > 0
+
+# Границы корзин гистограмм (секунды)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Монотонный счетчик с метками"""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self._values.items():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {value}"
+
+
+class Histogram:
+    """Гистограмма длительностей с метками"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # метки -> [счетчики корзин (последняя - +Inf), сумма, количество]
+        self._series = {}
+
+    def observe(self, value, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def samples(self):
+        for labels, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                le = _labels(self.labelnames, labels, f'le="{bound}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {total}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {count}"
+
+
+class Gauge:
+    """Текущее значение, которое вычисляется при каждом запросе метрик"""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, function):
+        self.name = name
+        self.documentation = documentation
+        self.function = function
+
+    def samples(self):
+        yield f"{self.name} {self.function()}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def expose(self):
+        """Все метрики в текстовом формате Prometheus"""
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                logging.error(f"Ошибка при сборе метрики {metric.name}: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HANDLER_DURATION = REGISTRY.register(
+    Histogram(
+        "quiz_bot_handler_duration_seconds",
+        "Время выполнения обработчика обновления",
+        ("handler", "pattern"),
+    )
+)
+HANDLER_ERRORS = REGISTRY.register(
+    Counter(
+        "quiz_bot_handler_errors_total",
+        "Исключения в обработчиках обновлений",
+        ("handler", "pattern"),
+    )
+)
+TESTS_STARTED = REGISTRY.register(
+    Counter("quiz_bot_tests_started_total", "Начатые тесты", ("level",))
+)
+TESTS_FINISHED = REGISTRY.register(
+    Counter("quiz_bot_tests_finished_total", "Завершенные тесты", ("level",))
+)
+API_DURATION = REGISTRY.register(
+    Histogram(
+        "quiz_bot_telegram_api_duration_seconds",
+        "Время запроса к Bot API (одна попытка)",
+        ("method",),
+    )
+)
+API_ERRORS = REGISTRY.register(
+    Counter(
+        "quiz_bot_telegram_api_errors_total",
+        "Ошибки запросов к Bot API по коду",
+        ("method", "code"),
+    )
+)
+DB_QUERY_DURATION = REGISTRY.register(
+    Histogram(
+        "quiz_bot_db_query_duration_seconds",
+        "Время SQL-запроса",
+        ("operation",),
+    )
+)
+
+
+def register_gauge(name, documentation, function):
+    """Добавляет метрику-значение, function вызывается при каждом запросе метрик"""
+    return REGISTRY.register(Gauge(name, documentation, function))
+
+
+# --- Обработчики ---
+
+
+def _timed_callback(callback, handler_name, pattern):
+    async def wrapper(update, context):
+        started = time.perf_counter()
+        try:
+            result = callback(update, context)
+            # Обработчик может быть обычной функцией, возвращающей корутину
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+        except Exception:
+            HANDLER_ERRORS.inc(handler_name, pattern)
+            raise
+        finally:
+            HANDLER_DURATION.observe(time.perf_counter() - started, handler_name, pattern)
+
+    wrapper.__name__ = handler_name
+    return wrapper
+
+
+def instrument_handlers(application):
+    """Оборачивает callback всех зарегистрированных обработчиков замером времени"""
+    wrap_handler_callbacks(application, _timed_callback)
+
+
+# --- Bot API ---
+
+
+def api_error_code(error):
+    """Код ошибки Bot API для метки code"""
+    for error_type, code in (
+        (RetryAfter, "429"),
+        (Forbidden, "403"),
+        (InvalidToken, "401"),
+        (Conflict, "409"),
+        (ChatMigrated, "400"),
+        (BadRequest, "400"),
+        (TimedOut, "timeout"),
+        (NetworkError, "network"),
+    ):
+        if isinstance(error, error_type):
+            return code
+    return type(error).__name__
+
+
+def observe_api_call(method, seconds, error):
+    """Хук планировщика отправки (SendScheduler.on_api_call)"""
+    API_DURATION.observe(seconds, method)
+    if error is not None:
+        API_ERRORS.inc(method, api_error_code(error))
+
+
+# --- База данных ---
+
+
+def instrument_engine(sync_engine):
+    """Замер времени SQL-запросов через события engine"""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(connection, cursor, statement, parameters, context, executemany):
+        connection.info.setdefault("metrics_query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(connection, cursor, statement, parameters, context, executemany):
+        started = connection.info["metrics_query_started"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement else ""
+        DB_QUERY_DURATION.observe(time.perf_counter() - started, operation)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        # Неудачный запрос не доходит до after_cursor_execute
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("metrics_query_started"):
+            connection.info["metrics_query_started"].pop()
+
+
+def instrument_application(application, sync_engine):
+    """Подключает метрики к обработчикам, планировщику отправки и engine"""
+    instrument_handlers(application)
+    instrument_engine(sync_engine)
+    scheduler = application.bot.rate_limiter
+    if scheduler is not None and hasattr(scheduler, "on_api_call"):
+        scheduler.on_api_call = observe_api_call
+        register_gauge(
+            "quiz_bot_send_queue_depth",
+            "Запросы в очереди планировщика отправки",
+            lambda: scheduler.metrics()["queue_depth"],
+        )
+
+
+# --- HTTP-сервер ---
+
+
+class MetricsServer:
+    """HTTP-сервер /metrics; start и stop подходят для post_init и post_stop"""
+
+    def __init__(self, host=METRICS_LISTEN, port=METRICS_PORT, registry=REGISTRY):
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self._server = None
+
+    async def start(self, application=None):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logging.info(f"Метрики доступны на http://{self.host}:{self.port}/metrics")
+
+    async def stop(self, application=None):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status = "200 OK"
+                body = self.registry.expose().encode("utf-8")
+            else:
+                status = "404 Not Found"
+                body = b"not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("ascii")
+                + body
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,352 @@
+"""Профилирование работающего бота по требованию, без перезапуска.
+
+Сеанс профилирования запускается командой /profile (только для
+ADMIN_USER_IDS) или сигналом SIGUSR1:
+
+    /profile          - следующие PROFILE_DEFAULT_UPDATES обработанных обновлений
+    /profile 500      - следующие 500 обновлений
+    /profile 30s      - 30 секунд
+    /profile stop     - остановить сеанс досрочно
+    kill -USR1 <pid>  - PROFILE_SIGNAL_SECONDS секунд (повторный сигнал - остановка)
+
+Вместо cProfile используется выборка стека: отдельный поток каждые
+PROFILE_INTERVAL_MS мс снимает стек потока event loop. Обработчики разных
+пользователей выполняются вперемешку в одном потоке, и cProfile не может
+разделить время между ними; выборка же относит каждый снимок к обработчику
+текущей задачи asyncio (на время сеанса обработчики оборачиваются и
+запоминают свою задачу). Снимки, где loop ждет событий, считаются простоем.
+
+По окончании в PROFILE_DIR пишутся два файла:
+- profile-<время>.folded - стеки в формате "обработчик;функция;... число"
+  (flamegraph.pl, speedscope);
+- profile-<время>.txt - сводка: доля обработчиков и самые затратные функции.
+Сводка также пишется в лог, а при запуске командой отправляется в чат.
+
+Без активного сеанса нет ни потока, ни обернутых обработчиков.
+"""
+
+import asyncio
+import inspect
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from update_processing import iter_handlers
+
+# Пользователи, которым доступна команда /profile (через запятую)
+ADMIN_USER_IDS = frozenset(
+    int(user_id) for user_id in os.getenv("ADMIN_USER_IDS", "").replace(",", " ").split()
+)
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# Интервал между снимками стека (мс)
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+# Сколько обновлений профилировать по /profile без аргумента
+PROFILE_DEFAULT_UPDATES = int(os.getenv("PROFILE_DEFAULT_UPDATES", "200"))
+# Длительность сеанса по сигналу SIGUSR1 (секунды)
+PROFILE_SIGNAL_SECONDS = float(os.getenv("PROFILE_SIGNAL_SECONDS", "30"))
+# Любой сеанс завершается не позже чем через столько секунд
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "600"))
+# Сколько функций выводить в сводке
+PROFILE_TOP = int(os.getenv("PROFILE_TOP", "15"))
+
+IDLE = "(ожидание событий)"
+OUTSIDE_HANDLERS = "(вне обработчиков)"
+# Ограничение Telegram на длину сообщения
+_MESSAGE_LIMIT = 4096
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _is_idle(code):
+    # Loop ждет событий в selector.select()
+    return code.co_name == "select" and code.co_filename.endswith("selectors.py")
+
+
+class ProfileSession:
+    """Один сеанс: поток выборки и обернутые на время сеанса обработчики"""
+
+    def __init__(self, application, loop, seconds, updates, on_report):
+        self.application = application
+        self.loop = loop
+        self.thread_id = threading.get_ident()
+        self.updates_left = updates
+        self.on_report = on_report
+        self.started = time.monotonic()
+        self.deadline = self.started + min(seconds or PROFILE_MAX_SECONDS, PROFILE_MAX_SECONDS)
+        self.started_at = datetime.now()
+        # (метка, код внешней функции, ..., код внутренней) -> число снимков
+        self.stacks = Counter()
+        self.samples = 0
+        self.idle = 0
+        self.handled = 0
+        # задача asyncio -> имя выполняемого в ней обработчика
+        self.task_handlers = {}
+        self._originals = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self.on_finish = None
+
+    def start(self):
+        self._wrap_handlers()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    # --- Обработчики ---
+
+    def _wrap_handlers(self):
+        for handler in iter_handlers(self.application):
+            callback = handler.callback
+            name = getattr(callback, "__name__", type(callback).__name__)
+            # Сама команда /profile в профиль не попадает
+            if name == profile_command.__name__:
+                continue
+            self._originals.append((handler, callback))
+            handler.callback = self._profiled_callback(callback, name)
+
+    def _restore_handlers(self):
+        for handler, callback in self._originals:
+            handler.callback = callback
+        self._originals = []
+
+    def _profiled_callback(self, callback, name):
+        async def wrapper(update, context):
+            task = asyncio.current_task()
+            self.task_handlers[task] = name
+            try:
+                result = callback(update, context)
+                # Обработчик может быть обычной функцией, возвращающей корутину
+                if inspect.isawaitable(result):
+                    result = await result
+                return result
+            finally:
+                self.task_handlers.pop(task, None)
+                self._handled()
+
+        wrapper.__name__ = name
+        return wrapper
+
+    def _handled(self):
+        self.handled += 1
+        if self.updates_left is not None:
+            self.updates_left -= 1
+            if self.updates_left <= 0:
+                self._stop.set()
+
+    # --- Поток выборки ---
+
+    def _run(self):
+        interval = PROFILE_INTERVAL_MS / 1000
+        try:
+            while not self._stop.wait(interval):
+                if time.monotonic() >= self.deadline:
+                    break
+                self._sample()
+        finally:
+            self._restore_handlers()
+            self._finish()
+
+    def _sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        self.samples += 1
+        # Задача, которую loop выполняет в момент снимка
+        task = asyncio.current_task(self.loop)
+        if task is None and _is_idle(frame.f_code):
+            self.idle += 1
+            return
+        stack = []
+        while frame is not None:
+            stack.append(frame.f_code)
+            frame = frame.f_back
+        stack.reverse()
+        label = self.task_handlers.get(task, OUTSIDE_HANDLERS)
+        self.stacks[(label, *stack)] += 1
+
+    def _finish(self):
+        try:
+            summary = self.summary()
+            logging.info(summary)
+            paths = self.write(PROFILE_DIR, summary)
+            summary += "\n\nФайлы: " + ", ".join(paths)
+            logging.info(f"Профиль записан: {', '.join(paths)}")
+        except Exception as e:
+            logging.error(f"Ошибка при записи профиля: {e}")
+            summary = f"Ошибка при записи профиля: {e}"
+        finally:
+            if self.on_finish is not None:
+                self.on_finish(self)
+        if self.on_report is not None:
+            try:
+                self.on_report(summary)
+            except Exception as e:
+                logging.error(f"Ошибка при отправке сводки профиля: {e}")
+
+    # --- Результаты ---
+
+    def summary(self):
+        duration = time.monotonic() - self.started
+        busy = self.samples - self.idle
+        handlers = Counter()
+        own = Counter()
+        cumulative = Counter()
+        for (label, *stack), count in self.stacks.items():
+            handlers[label] += count
+            own[stack[-1]] += count
+            for code in set(stack):
+                cumulative[code] += count
+
+        def share(count, total):
+            return f"{count * 100 / total:5.1f} %" if total else "    -"
+
+        lines = [
+            f"Профиль {self.started_at:%Y-%m-%d %H:%M:%S}: {duration:.1f} с, "
+            f"снимков {self.samples} (каждые {PROFILE_INTERVAL_MS:g} мс), "
+            f"обработано обновлений {self.handled}",
+            f"Простой event loop: {share(self.idle, self.samples)}",
+            "",
+            "Обработчики (доля занятого времени):",
+        ]
+        for label, count in handlers.most_common():
+            lines.append(f"  {share(count, busy)}  {count:>6}  {label}")
+        lines += ["", f"Функции, собственное время (топ {PROFILE_TOP}):"]
+        for code, count in own.most_common(PROFILE_TOP):
+            lines.append(f"  {share(count, busy)}  {count:>6}  {_frame_label(code)}")
+        lines += ["", f"Функции, с вложенными вызовами (топ {PROFILE_TOP}):"]
+        for code, count in cumulative.most_common(PROFILE_TOP):
+            lines.append(f"  {share(count, busy)}  {count:>6}  {_frame_label(code)}")
+        return "\n".join(lines)
+
+    def write(self, directory, summary):
+        """Записывает стеки и сводку, возвращает пути файлов"""
+        os.makedirs(directory, exist_ok=True)
+        base = name = os.path.join(directory, f"profile-{self.started_at:%Y%m%d-%H%M%S}")
+        # Несколько сеансов за одну секунду не перезаписывают друг друга
+        suffix = 1
+        while os.path.exists(base + ".txt"):
+            suffix += 1
+            base = f"{name}-{suffix}"
+        with open(base + ".folded", "w", encoding="utf-8") as f:
+            for (label, *stack), count in self.stacks.most_common():
+                frames = ";".join(_frame_label(code) for code in stack)
+                f.write(f"{label};{frames} {count}\n")
+            if self.idle:
+                f.write(f"{IDLE} {self.idle}\n")
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(summary + "\n")
+        return [base + ".folded", base + ".txt"]
+
+
+class Profiler:
+    """Не больше одного сеанса профилирования одновременно"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._session = None
+
+    @property
+    def active(self):
+        return self._session is not None
+
+    def start(self, application, seconds=None, updates=None, on_report=None):
+        """Запускает сеанс из потока event loop; False, если сеанс уже идет.
+
+        Сеанс длится seconds секунд или до updates обработанных обновлений
+        (но не дольше PROFILE_MAX_SECONDS). on_report(сводка) вызывается из
+        потока выборки по окончании.
+        """
+        with self._lock:
+            if self._session is not None:
+                return False
+            session = ProfileSession(
+                application, asyncio.get_running_loop(), seconds, updates, on_report
+            )
+            session.on_finish = self._finished
+            self._session = session
+        session.start()
+        target = f"{updates} обновлений" if updates else f"{seconds:g} с"
+        logging.info(f"Профилирование запущено: {target}")
+        return True
+
+    def stop(self):
+        """Досрочно завершает сеанс; False, если сеанса нет"""
+        session = self._session
+        if session is None:
+            return False
+        session.stop()
+        return True
+
+    def _finished(self, session):
+        with self._lock:
+            if self._session is session:
+                self._session = None
+
+
+profiler = Profiler()
+
+
+async def profile_command(update, context):
+    """/profile [N | Ns | stop] - профилирование (только для ADMIN_USER_IDS)"""
+    user = update.effective_user
+    if user is None or user.id not in ADMIN_USER_IDS:
+        return
+    message = update.effective_message
+    argument = context.args[0].lower() if context.args else ""
+
+    if argument == "stop":
+        if not profiler.stop():
+            await message.reply_text("Профилирование не запущено.")
+        return
+
+    seconds = updates = None
+    if not argument:
+        updates = PROFILE_DEFAULT_UPDATES
+    elif argument.endswith("s") and argument[:-1].isdigit() and int(argument[:-1]) > 0:
+        seconds = int(argument[:-1])
+    elif argument.isdigit() and int(argument) > 0:
+        updates = int(argument)
+    else:
+        await message.reply_text("Использование: /profile [число обновлений | 30s | stop]")
+        return
+
+    loop = asyncio.get_running_loop()
+    bot = context.bot
+    chat_id = message.chat_id
+
+    def report(summary):
+        # Вызывается из потока выборки
+        if len(summary) > _MESSAGE_LIMIT:
+            summary = summary[: _MESSAGE_LIMIT - 1] + "…"
+        asyncio.run_coroutine_threadsafe(bot.send_message(chat_id, summary), loop)
+
+    if not profiler.start(context.application, seconds, updates, on_report=report):
+        await message.reply_text("Профилирование уже идет (/profile stop - остановить).")
+        return
+    target = f"{updates} обновлений" if updates else f"{seconds} с"
+    await message.reply_text(f"Профилирование запущено: {target}. Сводка придет сюда.")
+
+
+async def install_signal_handler(application):
+    """post_init: SIGUSR1 запускает сеанс на PROFILE_SIGNAL_SECONDS, повторный - останавливает"""
+    if not hasattr(signal, "SIGUSR1"):
+        return
+
+    def toggle():
+        # Вызывается event loop как обычный callback, уже вне обработчика сигнала
+        if not profiler.stop():
+            profiler.start(application, seconds=PROFILE_SIGNAL_SECONDS)
+
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, toggle)
+    except (NotImplementedError, RuntimeError):
+        # Сигналы доступны только loop главного потока и не на всех платформах
+        logging.warning("SIGUSR1 недоступен, профилирование - только командой /profile")
@@ -0,0 +1,158 @@
+"""Аудит запросов к БД: число запросов на обновление, N+1 и медленные запросы.
+
+Включается переменной DB_QUERY_AUDIT=1. Тогда к engine подключаются события
+SQLAlchemy, а каждый обработчик обновления выполняется в области аудита
+со своим именем (audit_scope):
+
+- после обработчика в лог пишется число SQL-запросов и их общее время;
+- один и тот же текст запроса, выполненный в области
+  DB_REPEATED_QUERY_THRESHOLD раз и больше (с разными параметрами - например,
+  ленивая загрузка связи в цикле), помечается как возможный N+1;
+- запросы дольше DB_SLOW_QUERY_MS пишутся в лог с именем обработчика
+  (или "вне обработчика" для периодических задач).
+
+Область можно открыть и вне обработчиков: with audit_scope("load_custom_tests").
+Без DB_QUERY_AUDIT события не подключаются и обработчики не оборачиваются;
+audit_scope тогда только устанавливает ContextVar.
+"""
+
+import inspect
+import logging
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+from database import async_engine, engine
+from update_processing import wrap_handler_callbacks
+
+DB_QUERY_AUDIT = os.getenv("DB_QUERY_AUDIT", "0") == "1"
+# Порог медленного запроса (мс)
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "100"))
+# Сколько одинаковых запросов в одной области считается N+1
+DB_REPEATED_QUERY_THRESHOLD = int(os.getenv("DB_REPEATED_QUERY_THRESHOLD", "5"))
+
+# Сколько символов запроса выводить в лог
+_STATEMENT_PREVIEW = 200
+
+_current_scope = ContextVar("query_audit_scope", default=None)
+
+
+def _preview(statement):
+    return " ".join(statement.split())[:_STATEMENT_PREVIEW]
+
+
+class QueryScope:
+    """Запросы, выполненные в одной области (обычно - одно обновление)"""
+
+    __slots__ = ("name", "statements", "count", "duration")
+
+    def __init__(self, name):
+        self.name = name
+        self.statements = Counter()
+        self.count = 0
+        self.duration = 0.0
+
+    def record(self, statement, seconds):
+        self.statements[statement] += 1
+        self.count += 1
+        self.duration += seconds
+
+    def repeated(self, threshold=DB_REPEATED_QUERY_THRESHOLD):
+        """Запросы, выполненные threshold раз и больше: [(текст, число)]"""
+        return [
+            (statement, times)
+            for statement, times in self.statements.most_common()
+            if times >= threshold
+        ]
+
+    def report(self):
+        if not self.count:
+            return
+        logging.info(
+            f"SQL [{self.name}]: запросов {self.count} "
+            f"({len(self.statements)} разных), {self.duration * 1000:.1f} мс"
+        )
+        for statement, times in self.repeated():
+            logging.warning(
+                f"Возможный N+1 в {self.name}: запрос выполнен {times} раз: "
+                f"{_preview(statement)}"
+            )
+
+
+@contextmanager
+def audit_scope(name):
+    """Область аудита: запросы внутри нее учитываются под именем name"""
+    scope = QueryScope(name)
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+        if DB_QUERY_AUDIT:
+            scope.report()
+
+
+# --- События engine ---
+
+
+def _before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    connection.info.setdefault("audit_query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - connection.info["audit_query_started"].pop()
+    scope = _current_scope.get()
+    if scope is not None:
+        scope.record(statement, elapsed)
+    if elapsed * 1000 >= DB_SLOW_QUERY_MS:
+        where = scope.name if scope is not None else "вне обработчика"
+        logging.warning(
+            f"Медленный запрос ({elapsed * 1000:.0f} мс) в {where}: {_preview(statement)}"
+        )
+
+
+def _handle_error(exception_context):
+    # Неудачный запрос не доходит до after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("audit_query_started"):
+        connection.info["audit_query_started"].pop()
+
+
+def instrument_engine(sync_engine):
+    """Подключает аудит к engine (повторный вызов ничего не делает)"""
+    if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+
+# --- Обработчики ---
+
+
+def _audited_callback(callback, handler_name, pattern):
+    async def wrapper(update, context):
+        with audit_scope(handler_name):
+            result = callback(update, context)
+            # Обработчик может быть обычной функцией, возвращающей корутину
+            if inspect.isawaitable(result):
+                result = await result
+            return result
+
+    wrapper.__name__ = handler_name
+    return wrapper
+
+
+def audit_handlers(application):
+    """Выполняет каждый обработчик приложения в области аудита с его именем"""
+    wrap_handler_callbacks(application, _audited_callback)
+
+
+if DB_QUERY_AUDIT:
+    # Подключаем сразу, чтобы учитывались и запросы при загрузке модулей
+    instrument_engine(engine)
+    instrument_engine(async_engine.sync_engine)
@@ -0,0 +1,106 @@
+"""Кэш банка вопросов в памяти процесса.
+
+Вопросы меняются только при заполнении базы, поэтому загружаются один раз
+при старте и дальше читаются из памяти: прохождение теста не делает
+запросов к таблице questions. После изменения вопросов в БД нужно вызвать
+question_bank.invalidate() - кэш перезагрузится при следующем обращении.
+"""
+
+import logging
+import random
+from typing import NamedTuple
+
+from sqlalchemy import select
+
+from database import get_db, Question
+
+
+class QuestionRecord(NamedTuple):
+    """Неизменяемая копия строки questions (поля совпадают с моделью Question)"""
+
+    id: int
+    level: str
+    question_text: str
+    option1: str
+    option2: str
+    option3: str
+    option4: str
+    correct_option: int
+
+
+class QuestionBank:
+    """Вопросы по ID и списки ID по уровням.
+
+    Выведенные из банка вопросы (retired) доступны по ID - они нужны начатым
+    тестам, - но в списки уровней не входят.
+    """
+
+    def __init__(self):
+        self._by_id = {}
+        self._by_level = {}
+        self._loaded = False
+
+    def load(self):
+        """Загружает все вопросы из БД (синхронно, вызывается при старте)"""
+        with get_db() as db:
+            rows = db.execute(
+                select(
+                    Question.id,
+                    Question.level,
+                    Question.question_text,
+                    Question.option1,
+                    Question.option2,
+                    Question.option3,
+                    Question.option4,
+                    Question.correct_option,
+                    Question.retired,
+                ).order_by(Question.id)
+            ).all()
+
+        by_id = {}
+        by_level = {}
+        for *fields, retired in rows:
+            record = QuestionRecord(*fields)
+            by_id[record.id] = record
+            if not retired:
+                by_level.setdefault(record.level, []).append(record.id)
+
+        self._by_id = by_id
+        self._by_level = {level: tuple(ids) for level, ids in by_level.items()}
+        self._loaded = True
+        logging.info(f"Загружено вопросов в кэш: {len(by_id)}")
+
+    def invalidate(self):
+        """Сбрасывает кэш; вопросы будут заново загружены при следующем обращении"""
+        self._loaded = False
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def get(self, question_id):
+        """Возвращает QuestionRecord по ID или None"""
+        self._ensure_loaded()
+        return self._by_id.get(question_id)
+
+    def ids_for_level(self, level):
+        """Возвращает кортеж ID действующих вопросов уровня (например, junior_python)"""
+        self._ensure_loaded()
+        return self._by_level.get(level, ())
+
+    def sample(self, level, count):
+        """Возвращает до count случайных ID действующих вопросов уровня без повторов.
+
+        Выборка из списка уровня в памяти: все вопросы равновероятны, а
+        стоимость зависит только от count, но не от размера банка.
+        """
+        ids = self.ids_for_level(level)
+        return random.sample(ids, min(count, len(ids)))
+
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self._by_id)
+
+
+# Глобальный кэш вопросов
+question_bank = QuestionBank()
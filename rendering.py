@@ -0,0 +1,175 @@
+"""Кэш текстов вопросов и общие клавиатуры.
+
+Текст вопроса зависит только от вопроса, его позиции и числа вопросов
+в тесте, поэтому готовые строки хранятся в LRU-кэше: отправка вопроса и
+сообщение с результатом ответа - поиск в словаре. Для стандартных тестов
+ключ - (QuestionRecord, позиция, всего); запись содержит ID и содержимое
+вопроса, так что после изменения банка старые строки просто вытесняются.
+Для пользовательских тестов ключ - текст вопроса и вариантов.
+
+Объекты InlineKeyboardMarkup неизменяемы, поэтому постоянные клавиатуры
+создаются один раз и переиспользуются во всех сообщениях; клавиатуры
+ответа зависят от позиции вопроса и тоже кэшируются.
+"""
+
+import functools
+import os
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+# Размер кэша текстов (вопрос x позиция x вариант ответа)
+RENDER_CACHE_SIZE = 4096
+
+# Компактный режим стандартного теста: одно сообщение редактируется на месте
+# (результат ответа + следующий вопрос, в конце - итог вместе с кнопками),
+# вместо пары "редактирование + новое сообщение" на каждый ответ
+COMPACT_SESSION_MODE = os.getenv("COMPACT_SESSION_MODE", "0") == "1"
+
+
+@functools.lru_cache(maxsize=None)
+def answer_keyboard(position):
+    """Кнопки ответа на вопрос с позицией position (с нуля).
+
+    Позиция входит в callback_data (answer_<позиция>_<вариант>): повторное
+    нажатие или нажатие по кнопке уже отвеченного вопроса не засчитывается
+    следующему вопросу.
+    """
+    return InlineKeyboardMarkup(
+        [
+            [
+                InlineKeyboardButton("1️⃣", callback_data=f"answer_{position}_1"),
+                InlineKeyboardButton("2️⃣", callback_data=f"answer_{position}_2"),
+                InlineKeyboardButton("3️⃣", callback_data=f"answer_{position}_3"),
+                InlineKeyboardButton("4️⃣", callback_data=f"answer_{position}_4"),
+            ],
+            [InlineKeyboardButton("❌ Отменить тест", callback_data="cancel_standard_test")],
+        ]
+    )
+
+
+CUSTOM_ANSWER_KEYBOARD = InlineKeyboardMarkup(
+    [
+        [
+            InlineKeyboardButton("1️⃣", callback_data="custom_answer_1"),
+            InlineKeyboardButton("2️⃣", callback_data="custom_answer_2"),
+            InlineKeyboardButton("3️⃣", callback_data="custom_answer_3"),
+            InlineKeyboardButton("4️⃣", callback_data="custom_answer_4"),
+        ],
+        [InlineKeyboardButton("❌ Отменить тест", callback_data="cancel_custom_test")],
+    ]
+)
+
+TEST_RESULTS_KEYBOARD = InlineKeyboardMarkup(
+    [
+        [InlineKeyboardButton("🔄 Пройти тест снова", callback_data="start_test")],
+        [InlineKeyboardButton("📊 Таблица лидеров", callback_data="leaderboard")],
+        [InlineKeyboardButton("🏠 Главное меню", callback_data="main_menu")],
+    ]
+)
+
+CANCEL_CREATION_KEYBOARD = InlineKeyboardMarkup(
+    [[InlineKeyboardButton("❌ Отменить создание", callback_data="cancel_test_creation")]]
+)
+
+
+def _format_question(question_text, options, position, total):
+    return (
+        f"❓ Вопрос {position + 1}/{total}:\n\n"
+        f"{question_text}\n\n"
+        f"Варианты ответов:\n"
+        f"1️⃣ {options[0]}\n"
+        f"2️⃣ {options[1]}\n"
+        f"3️⃣ {options[2]}\n"
+        f"4️⃣ {options[3]}"
+    )
+
+
+def _format_verdict(options, correct_option, selected_option):
+    selected_answer_text = (
+        options[selected_option - 1]
+        if 1 <= selected_option <= len(options)
+        else "Неизвестный вариант"
+    )
+    if selected_option == correct_option:
+        return f"✅ Правильно!\n\nВаш ответ: {selected_answer_text}"
+    return (
+        "❌ Неправильно!\n\n"
+        f"Ваш ответ: {selected_answer_text}\n"
+        f"Правильный ответ: {options[correct_option - 1]}"
+    )
+
+
+def _format_feedback(message, options, correct_option, selected_option):
+    return f"{message}\n\n{_format_verdict(options, correct_option, selected_option)}"
+
+
+def _options(question):
+    return (question.option1, question.option2, question.option3, question.option4)
+
+
+@functools.lru_cache(maxsize=RENDER_CACHE_SIZE)
+def question_message(question, position, total):
+    """Текст вопроса стандартного теста (question - QuestionRecord)"""
+    return _format_question(question.question_text, _options(question), position, total)
+
+
+@functools.lru_cache(maxsize=RENDER_CACHE_SIZE)
+def answer_feedback(question, position, total, selected_option):
+    """Текст вопроса с результатом ответа для стандартного теста"""
+    return _format_feedback(
+        question_message(question, position, total),
+        _options(question),
+        question.correct_option,
+        selected_option,
+    )
+
+
+@functools.lru_cache(maxsize=RENDER_CACHE_SIZE)
+def answer_verdict(question, selected_option):
+    """Результат ответа без текста вопроса (для компактного режима)"""
+    return _format_verdict(_options(question), question.correct_option, selected_option)
+
+
+@functools.lru_cache(maxsize=RENDER_CACHE_SIZE)
+def _custom_question_message(question_text, options, position, total):
+    return _format_question(question_text, options, position, total)
+
+
+@functools.lru_cache(maxsize=RENDER_CACHE_SIZE)
+def _custom_answer_feedback(
+    question_text, options, correct_option, position, total, selected_option
+):
+    return _format_feedback(
+        _custom_question_message(question_text, options, position, total),
+        options,
+        correct_option,
+        selected_option,
+    )
+
+
+def _custom_options(question_data):
+    return (
+        question_data["option1"],
+        question_data["option2"],
+        question_data["option3"],
+        question_data["option4"],
+    )
+
+
+def custom_question_message(question_data, position, total):
+    """Текст вопроса пользовательского теста (question_data - словарь вопроса)"""
+    return _custom_question_message(
+        question_data["text"], _custom_options(question_data), position, total
+    )
+
+
+def custom_answer_feedback(question_data, position, total, selected_option):
+    """Текст вопроса пользовательского теста с результатом ответа"""
+    return _custom_answer_feedback(
+        question_data["text"],
+        _custom_options(question_data),
+        question_data["correct_option"],
+        position,
+        total,
+        selected_option,
+    )
@@ -0,0 +1,182 @@
+"""Инкрементальное заполнение банка вопросов.
+
+Вопросы хранятся в data/questions/<язык>/<уровень>.jsonl: одна строка -
+один вопрос (question_text, option1-option4, correct_option), уровень
+(например, junior_python) определяется по пути к файлу.
+
+Версия набора вопросов языка - хэш содержимого его файлов. Версии хранятся
+в bank_meta, поэтому при старте файлы только читаются и хэшируются: если
+версии совпали, JSON не разбирается и база не меняется. Для изменившегося
+языка вопросы читаются из файлов построчно и сопоставляются с БД по
+(level, question_text) с помощью хэша содержимого вопроса:
+- новые добавляются одной пачкой,
+- вопросы с измененными вариантами или ответом обновляются по ID,
+- вопросы, которых больше нет в банке, выводятся из него (retired): в новые
+  тесты они не попадают, но остаются в БД, и начатые тесты с ними
+  проходятся до конца. Вопрос, вернувшийся в файлы, снова становится
+  действующим.
+
+Запуск вручную (создает таблицы и заполняет базу): python seed.py
+"""
+
+import hashlib
+import json
+import os
+
+from sqlalchemy import insert, select, update
+
+from database import create_tables, get_db, BankMeta, Question
+from question_bank import question_bank
+
+QUESTIONS_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "data", "questions"
+)
+
+QUESTION_FIELDS = (
+    "level",
+    "question_text",
+    "option1",
+    "option2",
+    "option3",
+    "option4",
+    "correct_option",
+)
+
+
+def available_languages():
+    """Языки, для которых есть каталог с вопросами"""
+    return sorted(
+        name
+        for name in os.listdir(QUESTIONS_DIR)
+        if os.path.isdir(os.path.join(QUESTIONS_DIR, name))
+    )
+
+
+def question_files(language):
+    """Список (уровень, путь к файлу) вопросов языка"""
+    directory = os.path.join(QUESTIONS_DIR, language)
+    return [
+        (f"{name[: -len('.jsonl')]}_{language}", os.path.join(directory, name))
+        for name in sorted(os.listdir(directory))
+        if name.endswith(".jsonl")
+    ]
+
+
+def iter_questions(language):
+    """Построчно читает вопросы языка из файлов"""
+    for level, path in question_files(language):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield {"level": level, **json.loads(line)}
+
+
+def question_hash(question):
+    """Хэш содержимого вопроса (словаря с полями QUESTION_FIELDS)"""
+    payload = json.dumps([question[f] for f in QUESTION_FIELDS], ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def bank_version(language):
+    """Версия вопросов языка: хэш имен и содержимого его файлов"""
+    digest = hashlib.sha1()
+    for level, path in question_files(language):
+        digest.update(level.encode("ascii") + b"\0")
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _version_key(language):
+    return f"questions_version_{language}"
+
+
+def _sync_language(db, levels, questions):
+    """Приводит вопросы уровней levels в БД к вопросам из questions"""
+
+    existing = {}
+    stale = []
+    for question_id, level, text, content_hash, retired in db.execute(
+        select(
+            Question.id,
+            Question.level,
+            Question.question_text,
+            Question.content_hash,
+            Question.retired,
+        )
+        .where(Question.level.in_(levels))
+        # Из одинаковых вопросов основным остается действующий
+        .order_by(Question.retired, Question.id)
+    ):
+        if (level, text) in existing:
+            # Дубликат из старой базы
+            if not retired:
+                stale.append(question_id)
+        else:
+            existing[(level, text)] = (question_id, content_hash, retired)
+
+    new_rows = []
+    changed_rows = []
+    for question in questions:
+        row = {f: question[f] for f in QUESTION_FIELDS}
+        row["content_hash"] = question_hash(row)
+        found = existing.pop((row["level"], row["question_text"]), None)
+        if found is None:
+            new_rows.append(row)
+        elif found[1] != row["content_hash"] or found[2]:
+            changed_rows.append({**row, "id": found[0], "retired": False})
+    stale.extend(
+        question_id for question_id, _, retired in existing.values() if not retired
+    )
+
+    if new_rows:
+        db.execute(insert(Question), new_rows)
+    if changed_rows:
+        db.execute(update(Question), changed_rows)
+    if stale:
+        # Вопросы не удаляются: на них могут ссылаться начатые тесты
+        db.execute(update(Question).where(Question.id.in_(stale)).values(retired=True))
+    return {"added": len(new_rows), "updated": len(changed_rows), "retired": len(stale)}
+
+
+def seed_question_bank(languages=None):
+    """Заполняет БД вопросами из data/questions (по умолчанию - все языки).
+
+    Возвращает словарь {язык: статистика изменений} только по языкам,
+    версия которых изменилась.
+    """
+    if languages is None:
+        languages = available_languages()
+    versions = {language: bank_version(language) for language in languages}
+    result = {}
+    with get_db() as db:
+        stored = dict(
+            db.execute(
+                select(BankMeta.key, BankMeta.value).where(
+                    BankMeta.key.in_([_version_key(lang) for lang in languages])
+                )
+            ).all()
+        )
+        for language in languages:
+            if stored.get(_version_key(language)) == versions[language]:
+                continue
+            levels = [level for level, _ in question_files(language)]
+            result[language] = _sync_language(db, levels, iter_questions(language))
+            db.merge(BankMeta(key=_version_key(language), value=versions[language]))
+        if not result:
+            print("Банк вопросов не изменился")
+            return result
+        db.commit()
+
+    question_bank.invalidate()
+    for language, stats in result.items():
+        print(
+            f"Вопросы {language}: добавлено {stats['added']}, "
+            f"обновлено {stats['updated']}, выведено из банка {stats['retired']}"
+        )
+    return result
+
+
+if __name__ == "__main__":
+    create_tables()
+    seed_question_bank()
@@ -0,0 +1,257 @@
+"""Планировщик исходящих запросов к Bot API с учетом ограничений Telegram.
+
+Подключается к приложению как rate limiter PTB, поэтому через него проходят
+все запросы бота (send_message, edit_message_text и т.д.), а обработчики
+по-прежнему просто вызывают context.bot.
+
+- Запросы в конкретный чат (с chat_id) проходят через общую корзину бота
+  (BOT_API_GLOBAL_RATE в секунду). Запросы в группы и каналы (отрицательный
+  или строковый chat_id) сначала проходят еще и корзину токенов чата
+  (BOT_API_CHAT_RATE сообщений в секунду, всплеск до BOT_API_CHAT_BURST),
+  как в AIORateLimiter PTB. Личные чаты отдельно не ограничиваются: тест
+  идет в личном чате, и ожидание корзины чата под блокировкой пользователя
+  (update_processing) задерживало бы каждый ответ. Остальные запросы
+  (answerCallbackQuery, getMe, setWebhook) не ограничиваются.
+- Общая корзина раздает токены по приоритету: при очереди сначала уходят
+  ответы на вопросы (PRIORITY_ANSWER), потом обычные сообщения, потом
+  уведомления (PRIORITY_NOTIFICATION). Приоритет передается через
+  rate_limit_args: context.bot.send_message(..., rate_limit_args=PRIORITY_ANSWER).
+- Если Telegram все же ответил 429 (RetryAfter), чат (или весь бот для
+  запросов без чата) приостанавливается на retry_after секунд и запрос
+  повторяется, не больше BOT_API_MAX_RETRIES раз.
+- metrics() возвращает глубину очереди, число повторов и задержки отправки,
+  log_send_metrics периодически пишет их в лог.
+- Если задан on_api_call(метод, секунды, ошибка или None), он вызывается
+  после каждой попытки запроса (используется в metrics.py).
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from collections import deque
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+# Ограничения Telegram: около 30 сообщений в секунду на бота и около
+# одного сообщения в секунду в группу (короткие всплески допускаются)
+BOT_API_GLOBAL_RATE = float(os.getenv("BOT_API_GLOBAL_RATE", "30"))
+BOT_API_CHAT_RATE = float(os.getenv("BOT_API_CHAT_RATE", "1"))
+BOT_API_CHAT_BURST = int(os.getenv("BOT_API_CHAT_BURST", "3"))
+BOT_API_MAX_RETRIES = int(os.getenv("BOT_API_MAX_RETRIES", "3"))
+
+# Приоритеты (меньше - раньше); 0 не подходит: PTB не передает пустые rate_limit_args
+PRIORITY_ANSWER = 1
+PRIORITY_NORMAL = 2
+PRIORITY_NOTIFICATION = 3
+
+# Сколько последних задержек хранить для перцентилей
+LATENCY_WINDOW = 1000
+# Как часто писать метрики планировщика в лог (секунды)
+BOT_API_METRICS_INTERVAL = int(os.getenv("BOT_API_METRICS_INTERVAL", "300"))
+
+
+class TokenBucket:
+    """Корзина токенов: rate токенов в секунду, не больше capacity"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated", "paused_until")
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def delay(self):
+        """Сколько секунд ждать токен (0 - токен доступен)"""
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def is_idle(self):
+        return self.delay() == 0 and self.tokens >= self.capacity
+
+
+def is_group_chat(chat_id):
+    """Группа или канал: отрицательный ID или @имя канала"""
+    return isinstance(chat_id, str) or chat_id < 0
+
+
+class SendScheduler(BaseRateLimiter):
+    """Rate limiter PTB: корзины токенов по чатам и на бота, приоритетная очередь"""
+
+    def __init__(
+        self,
+        global_rate=BOT_API_GLOBAL_RATE,
+        chat_rate=BOT_API_CHAT_RATE,
+        chat_burst=BOT_API_CHAT_BURST,
+        max_retries=BOT_API_MAX_RETRIES,
+    ):
+        self._global = TokenBucket(global_rate, max(1, int(global_rate)))
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._max_retries = max_retries
+        self._chats = {}
+        # Очередь за общими токенами: (приоритет, номер, future)
+        self._queue = []
+        self._counter = itertools.count()
+        self._dispatcher = None
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._stats = {"sent": 0, "retry_after": 0, "failed": 0, "queue_max": 0}
+        self.on_api_call = None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            # Убираем корзины чатов, которые давно не писали (они снова полные)
+            if len(self._chats) > 10000:
+                self._chats = {
+                    key: value for key, value in self._chats.items() if not value.is_idle()
+                }
+            bucket = self._chats[chat_id] = TokenBucket(self._chat_rate, self._chat_burst)
+        return bucket
+
+    @staticmethod
+    async def _wait_bucket(bucket):
+        while True:
+            delay = bucket.delay()
+            if delay == 0:
+                bucket.take()
+                return
+            await asyncio.sleep(delay)
+
+    async def _acquire_global(self, priority):
+        if not self._queue and self._global.delay() == 0:
+            self._global.take()
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._counter), future))
+        self._stats["queue_max"] = max(self._stats["queue_max"], len(self._queue))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+
+    async def _dispatch(self):
+        """Раздает общие токены ожидающим запросам в порядке приоритета"""
+        while self._queue:
+            delay = self._global.delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            _, _, future = heapq.heappop(self._queue)
+            if not future.done():
+                self._global.take()
+                future.set_result(None)
+
+    def _observed(self, callback, endpoint):
+        """callback, который сообщает on_api_call время и ошибку каждой попытки"""
+        on_api_call = self.on_api_call
+
+        async def observed(*args, **kwargs):
+            started = time.monotonic()
+            try:
+                result = await callback(*args, **kwargs)
+            except Exception as e:
+                on_api_call(endpoint, time.monotonic() - started, e)
+                raise
+            on_api_call(endpoint, time.monotonic() - started, None)
+            return result
+
+        return observed
+
+    async def process_request(
+        self, callback, args, kwargs, endpoint, data, rate_limit_args
+    ):
+        if self.on_api_call is not None:
+            callback = self._observed(callback, endpoint)
+        chat_id = data.get("chat_id") if data else None
+        bucket = None
+        priority = None
+        if chat_id is not None:
+            priority = rate_limit_args or PRIORITY_NORMAL
+            if is_group_chat(chat_id):
+                bucket = self._chat_bucket(chat_id)
+
+        started = time.monotonic()
+        for attempt in range(self._max_retries + 1):
+            if bucket is not None:
+                await self._wait_bucket(bucket)
+            if priority is not None:
+                await self._acquire_global(priority)
+            try:
+                result = await callback(*args, **kwargs)
+            except RetryAfter as e:
+                self._stats["retry_after"] += 1
+                if attempt == self._max_retries:
+                    self._stats["failed"] += 1
+                    raise
+                logging.warning(
+                    f"Bot API: превышен лимит ({endpoint}, чат {chat_id}), "
+                    f"повтор через {e.retry_after} с"
+                )
+                if bucket is not None:
+                    bucket.pause(e.retry_after)
+                    continue
+                # Личный чат ждет сам, запрос без чата приостанавливает весь бот
+                if chat_id is None:
+                    self._global.pause(e.retry_after)
+                await asyncio.sleep(e.retry_after)
+                continue
+            if priority is not None:
+                self._stats["sent"] += 1
+                self._latencies.append(time.monotonic() - started)
+            return result
+
+    def metrics(self):
+        """Текущее состояние очереди и задержки отправки (секунды)"""
+        latencies = sorted(self._latencies)
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+        return {
+            "queue_depth": len(self._queue),
+            **self._stats,
+            "latency_p50": percentile(0.50),
+            "latency_p95": percentile(0.95),
+            "latency_max": latencies[-1] if latencies else 0.0,
+        }
+
+
+async def log_send_metrics(context):
+    """Задача job_queue: пишет метрики планировщика отправки в лог"""
+    scheduler = context.bot.rate_limiter
+    if not isinstance(scheduler, SendScheduler):
+        return
+    m = scheduler.metrics()
+    logging.info(
+        f"Bot API: отправлено {m['sent']}, в очереди {m['queue_depth']} "
+        f"(максимум {m['queue_max']}), 429: {m['retry_after']}, "
+        f"задержка p50 {m['latency_p50'] * 1000:.0f} мс, "
+        f"p95 {m['latency_p95'] * 1000:.0f} мс"
+    )
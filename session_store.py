@@ -0,0 +1,256 @@
+"""Состояние активных стандартных тестов в памяти с отложенной записью в БД.
+
+Ответы применяются к состоянию в памяти, а в user_progress и session_questions
+попадают пачками: по таймеру (каждые SESSION_FLUSH_INTERVAL секунд), при
+завершении или отмене теста и при остановке бота.
+
+Восстановление после сбоя:
+- завершение теста записывается сразу, в одной транзакции с обновлением
+  статистики, поэтому результат и MMR не теряются и не применяются дважды;
+- у незавершенного теста в БД могут отсутствовать ответы, данные после
+  последней записи (не больше чем за SESSION_FLUSH_INTERVAL секунд). После
+  перезапуска состояние пользователя загружается из БД при первом обращении,
+  и тест продолжается с последней записанной позиции: потерянные ответы
+  пользователь дает повторно.
+"""
+
+import asyncio
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from sqlalchemy import bindparam, select, update
+
+from database import (
+    AsyncSessionLocal,
+    get_async_db,
+    write_transaction,
+    SessionQuestion,
+    UserProgress,
+)
+
+# Интервал записи состояния активных тестов в БД (секунды)
+SESSION_FLUSH_INTERVAL = int(os.getenv("SESSION_FLUSH_INTERVAL", "10"))
+
+_progress_table = UserProgress.__table__
+_answers_table = SessionQuestion.__table__
+
+# Запись состояния теста; условие is_testing не дает устаревшей пачке
+# "воскресить" тест, который уже завершен или отменен
+_UPDATE_PROGRESS = (
+    update(_progress_table)
+    .where(
+        _progress_table.c.id == bindparam("b_id"),
+        _progress_table.c.is_testing == True,  # noqa: E712
+    )
+    .values(
+        current_question=bindparam("b_current_question"),
+        correct_answers=bindparam("b_correct_answers"),
+        last_answer_time=bindparam("b_last_answer_time"),
+        is_testing=bindparam("b_is_testing"),
+    )
+)
+
+_UPDATE_ANSWER = (
+    update(_answers_table)
+    .where(
+        _answers_table.c.session_id == bindparam("b_session_id"),
+        _answers_table.c.position == bindparam("b_position"),
+    )
+    .values(
+        chosen_option=bindparam("b_chosen_option"),
+        is_correct=bindparam("b_is_correct"),
+        answered_at=bindparam("b_answered_at"),
+    )
+)
+
+
+@dataclass
+class ActiveSession:
+    """Состояние стандартного теста пользователя"""
+
+    progress_id: int
+    user_id: int
+    level: str
+    question_ids: list
+    current_question: int = 0
+    correct_answers: int = 0
+    is_testing: bool = True
+    last_answer_time: datetime = field(default_factory=datetime.utcnow)
+    # Ответы, еще не записанные в session_questions
+    pending_answers: list = field(default_factory=list)
+
+    @property
+    def current_question_id(self):
+        """ID вопроса текущей позиции или None, если вопросы закончились"""
+        if self.current_question < len(self.question_ids):
+            return self.question_ids[self.current_question]
+        return None
+
+    def progress_row(self):
+        return {
+            "b_id": self.progress_id,
+            "b_current_question": self.current_question,
+            "b_correct_answers": self.correct_answers,
+            "b_last_answer_time": self.last_answer_time,
+            "b_is_testing": self.is_testing,
+        }
+
+
+class ActiveSessionStore:
+    """Активные тесты по user_id и множество еще не записанных изменений"""
+
+    def __init__(self):
+        self._sessions = {}
+        self._dirty = set()
+        self._flush_lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def start(self, progress, question_ids):
+        """Регистрирует только что сохраненный в БД тест"""
+        session = ActiveSession(
+            progress_id=progress.id,
+            user_id=progress.user_id,
+            level=progress.level,
+            question_ids=list(question_ids),
+        )
+        self._sessions[session.user_id] = session
+        self._dirty.discard(session.user_id)
+        return session
+
+    async def get(self, user_id):
+        """Возвращает активный тест пользователя, при необходимости загружая его из БД"""
+        session = self._sessions.get(user_id)
+        if session is None:
+            session = await self._load(user_id)
+        return session
+
+    async def _load(self, user_id):
+        async with get_async_db() as db:
+            progress = await db.scalar(
+                select(UserProgress).where(
+                    UserProgress.user_id == user_id,
+                    UserProgress.is_testing == True,  # noqa: E712
+                )
+            )
+            if not progress:
+                return None
+            question_ids = (
+                await db.scalars(
+                    select(SessionQuestion.question_id)
+                    .where(SessionQuestion.session_id == progress.id)
+                    .order_by(SessionQuestion.position)
+                )
+            ).all()
+        session = ActiveSession(
+            progress_id=progress.id,
+            user_id=user_id,
+            level=progress.level,
+            question_ids=list(question_ids),
+            current_question=progress.current_question,
+            correct_answers=progress.correct_answers,
+            last_answer_time=progress.last_answer_time,
+        )
+        return self._sessions.setdefault(user_id, session)
+
+    def record_answer(self, session, selected_option, is_correct):
+        """Применяет ответ на текущий вопрос к состоянию в памяти"""
+        now = datetime.utcnow()
+        session.pending_answers.append(
+            {
+                "b_session_id": session.progress_id,
+                "b_position": session.current_question,
+                "b_chosen_option": selected_option,
+                "b_is_correct": is_correct,
+                "b_answered_at": now,
+            }
+        )
+        if is_correct:
+            session.correct_answers += 1
+        session.current_question += 1
+        session.last_answer_time = now
+        self._dirty.add(session.user_id)
+
+    def discard(self, user_id):
+        """Убирает тест из памяти без записи (например, перед началом нового)"""
+        self._sessions.pop(user_id, None)
+        self._dirty.discard(user_id)
+
+    async def finish(self, db, session):
+        """Завершает тест: убирает его из памяти и записывает итог в сессию db.
+
+        Коммит выполняет вызывающий код, вместе с обновлением статистики.
+        """
+        self.discard(session.user_id)
+        session.is_testing = False
+        answers, session.pending_answers = session.pending_answers, []
+        await self._write(db, [session.progress_row()], answers)
+
+    async def flush(self):
+        """Записывает в БД все накопленные изменения одной транзакцией.
+
+        Возвращает количество записанных тестов.
+        """
+        async with self._flush_lock:
+            if not self._dirty:
+                return 0
+            taken = []
+            try:
+                # Отдельная сессия: запись не должна попадать в транзакцию
+                # обновления. Изменения снимаются уже под блокировкой записи:
+                # тест, замененный новым (id строки user_progress может
+                # достаться новому тесту), к этому моменту убран из памяти
+                async with AsyncSessionLocal() as db, write_transaction(db):
+                    taken = self._take_dirty()
+                    if taken:
+                        await self._write(
+                            db,
+                            [session.progress_row() for session, _ in taken],
+                            [answer for _, pending in taken for answer in pending],
+                        )
+            except Exception:
+                self._restore(taken)
+                raise
+            return len(taken)
+
+    def _take_dirty(self):
+        dirty, self._dirty = self._dirty, set()
+        taken = []
+        for user_id in dirty:
+            session = self._sessions.get(user_id)
+            if session is not None:
+                taken.append((session, session.pending_answers))
+                session.pending_answers = []
+        return taken
+
+    def _restore(self, taken):
+        # Возвращаем изменения, чтобы записать их при следующей попытке
+        for session, pending in taken:
+            session.pending_answers[:0] = pending
+            if session.user_id in self._sessions:
+                self._dirty.add(session.user_id)
+
+    @staticmethod
+    async def _write(db, progress_rows, answers):
+        if answers:
+            await db.execute(_UPDATE_ANSWER, answers)
+        if progress_rows:
+            await db.execute(_UPDATE_PROGRESS, progress_rows)
+
+
+# Глобальное хранилище активных тестов
+active_sessions = ActiveSessionStore()
+
+
+async def flush_active_sessions(context_or_application=None):
+    """Периодическая задача и хук остановки: сбрасывает активные тесты в БД"""
+    try:
+        flushed = await active_sessions.flush()
+    except Exception as e:
+        logging.error(f"Ошибка при записи активных тестов в БД: {e}")
+        return
+    if flushed:
+        logging.debug(f"Записано активных тестов: {flushed}")
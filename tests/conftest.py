@@ -0,0 +1,30 @@
+"""Общая настройка тестов.
+
+Модули бота импортируются из корня репозитория и привязываются к DB_PATH
+при импорте, поэтому временная база задается здесь, до импорта тестов:
+таблицы создаются, банк вопросов заполняется из data/questions.
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DB_PATH"] = os.path.join(_tmp.name, "test.db")
+os.environ.setdefault("BOT_TOKEN", "1:test")
+# Общий лимит бота не мешает тестам, которые шлют сотни сообщений подряд;
+# лимиты чатов остаются по умолчанию
+os.environ["BOT_API_GLOBAL_RATE"] = "100000"
+
+from database import create_tables  # noqa: E402
+from seed import seed_question_bank  # noqa: E402
+
+create_tables()
+with contextlib.redirect_stdout(io.StringIO()):
+    seed_question_bank()
@@ -0,0 +1,165 @@
+"""Обработчики бота на настоящем приложении с подменным Bot API."""
+
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import func, select
+from telegram import Update
+
+import bot
+from database import AsyncSessionLocal, UserProgress, UserStats
+from fake_bot_api import FakeBotAPI, UpdateFactory
+from metrics import TESTS_FINISHED, TESTS_STARTED
+from send_scheduler import SendScheduler
+from session_store import active_sessions
+
+bot.question_bank.load()
+bot.leaderboard.load()
+
+
+async def process(application, updates):
+    for data in updates:
+        await application.process_update(Update.de_json(data, application.bot))
+
+
+def run(scenario):
+    """Выполняет scenario(application, api, factory) внутри запущенного приложения"""
+
+    async def main():
+        api = FakeBotAPI()
+        application = bot.build_application(request=api)
+        async with application:
+            return await scenario(application, api, UpdateFactory())
+
+    return asyncio.run(main())
+
+
+def test_level_without_questions_keeps_current_test():
+    user_id = 7001
+
+    async def scenario(application, api, factory):
+        await process(
+            application,
+            [factory.callback(user_id, "level_python_junior")]
+            + [factory.callback(user_id, f"answer_{i}_1") for i in range(2)],
+        )
+        started = dict(TESTS_STARTED._values)
+        finished = dict(TESTS_FINISHED._values)
+        api.reset()
+
+        # Уровня нет: так выглядит и подделанный callback_data
+        await process(application, [factory.callback(user_id, "level_python_nonexistent")])
+
+        async with AsyncSessionLocal() as db:
+            stats = await db.scalar(select(UserStats).where(UserStats.user_id == user_id))
+        session = await active_sessions.get(user_id)
+        return api.requests, started, finished, stats, session
+
+    requests, started, finished, stats, session = run(scenario)
+    edits = [params["text"] for method, params in requests if method == "editMessageText"]
+    assert len(edits) == 1 and "нет вопросов" in edits[0]
+    assert not any(method == "sendMessage" for method, _ in requests)
+    assert TESTS_STARTED._values == started
+    assert TESTS_FINISHED._values == finished
+    assert stats.total_tests == 0
+    assert session.level == "junior_python"
+    assert session.current_question == 2
+
+
+def test_concurrent_starts_create_one_stats_row():
+    user_id = 7002
+
+    async def scenario(application, api, factory):
+        # Обновления подаются в обход очереди, без очередности по пользователю
+        await asyncio.gather(
+            *(
+                process(application, [factory.callback(user_id, "level_python_junior")])
+                for _ in range(10)
+            )
+        )
+        async with AsyncSessionLocal() as db:
+            stats_rows = await db.scalar(
+                select(func.count()).where(UserStats.user_id == user_id)
+            )
+            progress_rows = await db.scalar(
+                select(func.count()).where(UserProgress.user_id == user_id)
+            )
+        return stats_rows, progress_rows
+
+    assert run(scenario) == (1, 1)
+
+
+@pytest.mark.parametrize(
+    "compact, expected",
+    [
+        (False, {"sendMessage": 12, "editMessageText": 11, "answerCallbackQuery": 11}),
+        # Весь тест - правки одного сообщения
+        (True, {"sendMessage": 0, "editMessageText": 11, "answerCallbackQuery": 11}),
+    ],
+)
+def test_bot_api_calls_per_test(monkeypatch, compact, expected):
+    """Сколько запросов к Bot API стоит стандартный тест из 10 вопросов"""
+    monkeypatch.setattr(bot, "COMPACT_SESSION_MODE", compact)
+    user_id = 7100 + compact
+
+    async def scenario(application, api, factory):
+        api.reset()
+        await process(
+            application,
+            [factory.callback(user_id, "level_python_junior")]
+            + [factory.callback(user_id, f"answer_{i}_{i % 4 + 1}") for i in range(10)],
+        )
+        return dict(api.calls)
+
+    calls = run(scenario)
+    assert {method: calls.get(method, 0) for method in expected} == expected
+    assert sum(calls.values()) == sum(expected.values())
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_repeated_answer_tap_is_ignored(monkeypatch, compact):
+    """Второе нажатие той же кнопки не засчитывается следующему вопросу"""
+    monkeypatch.setattr(bot, "COMPACT_SESSION_MODE", compact)
+    user_id = 7300 + compact
+
+    async def scenario(application, api, factory):
+        await process(application, [factory.callback(user_id, "level_python_junior")])
+        api.reset()
+        await process(application, [factory.callback(user_id, "answer_0_1") for _ in range(2)])
+        session = await active_sessions.get(user_id)
+        markup = [p["reply_markup"] for _, p in api.requests if "reply_markup" in p][-1]
+        buttons = [b["callback_data"] for b in markup["inline_keyboard"][0]]
+        return session.current_question, dict(api.calls), buttons
+
+    position, calls, buttons = run(scenario)
+    assert position == 1
+    # На оба нажатия Telegram получает ответ, но вопрос обновляется один раз
+    assert calls["answerCallbackQuery"] == 2
+    assert calls["editMessageText"] == 1
+    # Кнопки следующего вопроса несут его позицию
+    assert buttons == ["answer_1_1", "answer_1_2", "answer_1_3", "answer_1_4"]
+
+
+def test_answers_are_fast_with_default_send_limits(monkeypatch):
+    """Лимиты Telegram по умолчанию не задерживают ответы в личном чате"""
+    monkeypatch.setattr(bot, "COMPACT_SESSION_MODE", False)
+    monkeypatch.setattr(
+        bot,
+        "SendScheduler",
+        lambda: SendScheduler(global_rate=30, chat_rate=1, chat_burst=3),
+    )
+    user_id = 7200
+
+    async def scenario(application, api, factory):
+        await process(application, [factory.callback(user_id, "level_python_junior")])
+        started = time.monotonic()
+        # Каждый ответ - правка сообщения с вопросом и новое сообщение
+        await process(
+            application, [factory.callback(user_id, f"answer_{i}_{i % 4 + 1}") for i in range(10)]
+        )
+        return time.monotonic() - started, api.calls["sendMessage"]
+
+    elapsed, sent = run(scenario)
+    assert sent == 12
+    assert elapsed < 1.5
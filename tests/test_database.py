@@ -0,0 +1,33 @@
+"""Запросы database.py на временной базе."""
+
+import asyncio
+
+from sqlalchemy import func, select
+
+from database import AsyncSessionLocal, UserStats, ensure_user_stats, get_async_db
+
+
+def test_concurrent_ensure_user_stats_creates_one_row():
+    user_id = 8001
+    names = [f"user{i}" for i in range(20)]
+
+    async def start(username):
+        # Каждая задача - отдельная сессия и соединение, как параллельные обновления
+        async with get_async_db() as db:
+            await ensure_user_stats(db, user_id, username)
+            await db.commit()
+
+    async def scenario():
+        await asyncio.gather(*(start(username) for username in names))
+        async with AsyncSessionLocal() as db:
+            return (
+                await db.execute(
+                    select(func.count(), func.max(UserStats.username)).where(
+                        UserStats.user_id == user_id
+                    )
+                )
+            ).one()
+
+    rows, username = asyncio.run(scenario())
+    assert rows == 1
+    assert username in names
@@ -0,0 +1,47 @@
+"""Таблица лидеров в памяти."""
+
+import random
+import time
+
+from leaderboard import LanguageRanking, LeaderboardEntry
+
+
+def random_entries(count, seed=0):
+    rng = random.Random(seed)
+    return [
+        LeaderboardEntry(
+            user_id, f"user{user_id}", rng.randint(0, 3000), rng.randint(0, 5)
+        )
+        for user_id in range(1, count + 1)
+    ]
+
+
+def test_bulk_build_matches_incremental_updates():
+    entries = random_entries(2000)
+    incremental = LanguageRanking()
+    for entry in entries:
+        incremental.update(*entry)
+    bulk = LanguageRanking.from_entries(entries)
+
+    assert len(bulk) == len(incremental)
+    assert bulk.top(50) == incremental.top(50)
+    for entry in entries[:200]:
+        assert bulk.rank(entry.user_id) == incremental.rank(entry.user_id)
+
+    # Живые обновления после загрузки работают как прежде
+    bulk.update(1, "user1", 10_000, 9)
+    assert bulk.top(1)[0].user_id == 1
+    assert bulk.rank(1) == (1, len(bulk))
+
+
+def test_bulk_build_of_million_users_is_fast():
+    entries = random_entries(1_000_000)
+    started = time.perf_counter()
+    ranking = LanguageRanking.from_entries(entries)
+    elapsed = time.perf_counter() - started
+
+    assert len(ranking) == sum(1 for entry in entries if entry.total_tests)
+    top = ranking.top(10)
+    assert [entry.mmr for entry in top] == sorted((e.mmr for e in top), reverse=True)
+    # insort на каждую строку строил такой рейтинг минутами
+    assert elapsed < 5
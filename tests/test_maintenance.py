@@ -0,0 +1,44 @@
+"""Обслуживание базы: возврат свободных страниц файлу."""
+
+import asyncio
+
+import maintenance
+from database import async_engine
+
+
+def test_compact_database_returns_all_free_pages(monkeypatch):
+    # Несколько шагов: страниц больше, чем возвращается за одну транзакцию
+    monkeypatch.setattr(maintenance, "VACUUM_PAGES_PER_STEP", 50)
+
+    database_size = maintenance._database_size
+    calls = []
+
+    async def counted_database_size(connection):
+        calls.append(1)
+        return await database_size(connection)
+
+    async def free_pages():
+        async with async_engine.connect() as connection:
+            return (await database_size(connection))[1]
+
+    async def scenario():
+        async with async_engine.begin() as connection:
+            await connection.exec_driver_sql("CREATE TABLE vacuum_filler (data TEXT)")
+            for _ in range(400):
+                await connection.exec_driver_sql(
+                    "INSERT INTO vacuum_filler VALUES (?)", ("x" * 2000,)
+                )
+        async with async_engine.begin() as connection:
+            await connection.exec_driver_sql("DROP TABLE vacuum_filler")
+        freed = await free_pages()
+        monkeypatch.setattr(maintenance, "_database_size", counted_database_size)
+        reclaimed = await maintenance.compact_database()
+        return freed, reclaimed, await free_pages()
+
+    freed, reclaimed, remaining = asyncio.run(scenario())
+    assert freed > 200
+    assert remaining == 0
+    assert reclaimed > 0
+    # Каждый шаг возвращает VACUUM_PAGES_PER_STEP страниц, а не одну
+    steps = len(calls) - 2
+    assert steps <= freed // 50 + 2
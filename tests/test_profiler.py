@@ -0,0 +1,62 @@
+"""Профилирование по сигналу SIGUSR1."""
+
+import asyncio
+import os
+import signal
+
+import pytest
+from telegram import Update
+
+import bot
+import profiler
+from fake_bot_api import FakeBotAPI, UpdateFactory
+from update_processing import iter_handlers
+
+
+async def wait_until(condition, timeout=5):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return True
+        await asyncio.sleep(0.01)
+    return False
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGUSR1"), reason="нет SIGUSR1")
+def test_sigusr1_toggles_profiling(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiler, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(profiler, "PROFILE_INTERVAL_MS", 1)
+    bot.question_bank.load()
+    bot.leaderboard.load()
+    factory = UpdateFactory()
+    updates = []
+    for user_id in (9101, 9102, 9103):
+        updates.append(factory.callback(user_id, "level_python_junior"))
+        updates += [factory.callback(user_id, f"answer_{i}_{i % 4 + 1}") for i in range(10)]
+
+    async def scenario():
+        application = bot.build_application(request=FakeBotAPI())
+        originals = [handler.callback for handler in iter_handlers(application)]
+        async with application:
+            loop = asyncio.get_running_loop()
+            # Как при run_polling/run_webhook: обработчик ставит post_init
+            await application.post_init(application)
+            try:
+                os.kill(os.getpid(), signal.SIGUSR1)
+                assert await wait_until(lambda: profiler.profiler.active)
+                for data in updates:
+                    await application.process_update(Update.de_json(data, application.bot))
+                    await asyncio.sleep(0.005)
+
+                os.kill(os.getpid(), signal.SIGUSR1)
+                assert await wait_until(lambda: not profiler.profiler.active)
+            finally:
+                loop.remove_signal_handler(signal.SIGUSR1)
+        restored = [handler.callback for handler in iter_handlers(application)]
+        return originals, restored
+
+    originals, restored = asyncio.run(scenario())
+    assert restored == originals
+    summaries = list(tmp_path.glob("profile-*.txt"))
+    assert len(summaries) == 1
+    assert "handle_answer" in summaries[0].read_text(encoding="utf-8")
+    assert list(tmp_path.glob("profile-*.folded"))
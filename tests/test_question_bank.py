@@ -0,0 +1,43 @@
+"""Выборка вопросов для теста из банка в памяти."""
+
+import time
+from collections import Counter
+
+from question_bank import QuestionBank
+
+
+def bank_with_level(level, ids):
+    bank = QuestionBank()
+    bank._by_level = {level: tuple(ids)}
+    bank._loaded = True
+    return bank
+
+
+def test_sample_is_uniform_and_without_repeats():
+    # ID с пропусками не влияют на вероятность выбора
+    ids = list(range(1, 40)) + [1000]
+    bank = bank_with_level("junior_python", ids)
+    counts = Counter()
+    for _ in range(2000):
+        sample = bank.sample("junior_python", 2)
+        assert len(set(sample)) == 2
+        counts.update(sample)
+
+    assert set(counts) == set(ids)
+    # Ожидается по 100 выборов на вопрос (4000 / 40)
+    assert min(counts.values()) > 60
+    assert max(counts.values()) < 150
+    assert sorted(bank.sample("junior_python", 50)) == ids
+    assert bank.sample("senior_python", 10) == []
+
+
+def test_sample_cost_does_not_grow_with_level_size():
+    def cost(size):
+        bank = bank_with_level("junior_python", range(1, size + 1))
+        started = time.perf_counter()
+        for _ in range(2000):
+            bank.sample("junior_python", 10)
+        return time.perf_counter() - started
+
+    small, large = cost(1_000), cost(1_000_000)
+    assert large < small * 3 + 0.01
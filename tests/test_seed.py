@@ -0,0 +1,56 @@
+"""Инкрементальное заполнение банка вопросов."""
+
+import json
+
+import seed
+from question_bank import question_bank
+
+LEVEL = "junior_seedtest"
+
+
+def write_questions(directory, texts):
+    level_dir = directory / "seedtest"
+    level_dir.mkdir(exist_ok=True)
+    with open(level_dir / "junior.jsonl", "w", encoding="utf-8") as f:
+        for text in texts:
+            question = {
+                "question_text": text,
+                "option1": "a",
+                "option2": "b",
+                "option3": "c",
+                "option4": "d",
+                "correct_option": 1,
+            }
+            f.write(json.dumps(question, ensure_ascii=False) + "\n")
+
+
+def sample_all():
+    return set(question_bank.sample(LEVEL, 100))
+
+
+def test_removed_questions_are_retired_and_can_return(tmp_path, monkeypatch):
+    monkeypatch.setattr(seed, "QUESTIONS_DIR", str(tmp_path))
+    texts = [f"Вопрос {i}" for i in range(12)]
+
+    write_questions(tmp_path, texts)
+    assert seed.seed_question_bank(["seedtest"])["seedtest"]["added"] == 12
+    all_ids = set(question_bank.ids_for_level(LEVEL))
+    by_text = {question_bank.get(i).question_text: i for i in all_ids}
+    removed = {by_text["Вопрос 0"], by_text["Вопрос 1"]}
+
+    # Вопросы убраны из файла, а в начатых тестах они уже выбраны
+    write_questions(tmp_path, texts[2:])
+    stats = seed.seed_question_bank(["seedtest"])["seedtest"]
+    assert (stats["added"], stats["retired"]) == (0, 2)
+    assert set(question_bank.ids_for_level(LEVEL)) == all_ids - removed
+    assert sample_all() == all_ids - removed
+    for question_id in removed:
+        # Начатый тест по-прежнему может показать вопрос
+        assert question_bank.get(question_id) is not None
+
+    # Вопрос вернулся в файл - он снова действующий, с прежним ID
+    write_questions(tmp_path, texts)
+    stats = seed.seed_question_bank(["seedtest"])["seedtest"]
+    assert (stats["added"], stats["updated"], stats["retired"]) == (0, 2, 0)
+    assert set(question_bank.ids_for_level(LEVEL)) == all_ids
+    assert sample_all() == all_ids
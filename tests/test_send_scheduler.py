@@ -0,0 +1,33 @@
+"""Лимиты исходящих запросов планировщика send_scheduler."""
+
+import asyncio
+import time
+
+from send_scheduler import SendScheduler
+
+
+async def send_many(scheduler, chat_id, count):
+    async def callback():
+        return True
+
+    started = time.monotonic()
+    for _ in range(count):
+        await scheduler.process_request(
+            callback, (), {}, "sendMessage", {"chat_id": chat_id}, None
+        )
+    return time.monotonic() - started
+
+
+def test_private_chats_are_limited_only_by_global_rate():
+    scheduler = SendScheduler(global_rate=1000, chat_rate=1, chat_burst=3)
+    elapsed = asyncio.run(send_many(scheduler, 42, 10))
+    assert elapsed < 0.1
+    assert scheduler.metrics()["sent"] == 10
+
+
+def test_group_chats_keep_per_chat_limit():
+    scheduler = SendScheduler(global_rate=1000, chat_rate=20, chat_burst=2)
+    # Два сообщения из всплеска сразу, еще четыре - по 50 мс
+    elapsed = asyncio.run(send_many(scheduler, -100123, 6))
+    assert 0.18 < elapsed < 0.5
+    assert asyncio.run(send_many(scheduler, "@channel", 3)) > 0.04
@@ -0,0 +1,133 @@
+"""Отложенная запись активных тестов и восстановление после сбоя."""
+
+import asyncio
+
+from sqlalchemy import insert, select
+
+from database import AsyncSessionLocal, SessionQuestion, UserProgress, write_transaction
+from session_store import ActiveSessionStore
+
+QUESTION_IDS = list(range(1, 11))
+
+
+async def create_progress(user_id):
+    """Тест в БД, как его создает handle_level_selection"""
+    async with AsyncSessionLocal() as db:
+        progress = UserProgress(user_id=user_id, level="junior_python", is_testing=True)
+        db.add(progress)
+        await db.flush()
+        await db.execute(
+            insert(SessionQuestion),
+            [
+                {"session_id": progress.id, "position": position, "question_id": question_id}
+                for position, question_id in enumerate(QUESTION_IDS)
+            ],
+        )
+        await db.commit()
+    return progress
+
+
+async def stored_state(progress_id):
+    async with AsyncSessionLocal() as db:
+        progress = await db.get(UserProgress, progress_id)
+        answers = (
+            await db.scalars(
+                select(SessionQuestion.chosen_option)
+                .where(SessionQuestion.session_id == progress_id)
+                .order_by(SessionQuestion.position)
+            )
+        ).all()
+    return progress, answers
+
+
+def test_flush_writes_progress_and_answers():
+    async def scenario():
+        store = ActiveSessionStore()
+        progress = await create_progress(6001)
+        session = store.start(progress, QUESTION_IDS)
+        for option in (1, 2, 3):
+            store.record_answer(session, option, option == 1)
+
+        assert await store.flush() == 1
+        assert await store.flush() == 0  # нечего записывать
+        return await stored_state(progress.id)
+
+    progress, answers = asyncio.run(scenario())
+    assert (progress.current_question, progress.correct_answers) == (3, 1)
+    assert progress.is_testing
+    assert answers == [1, 2, 3] + [None] * 7
+
+
+def test_restart_resumes_from_last_flushed_position():
+    async def scenario():
+        store = ActiveSessionStore()
+        progress = await create_progress(6002)
+        session = store.start(progress, QUESTION_IDS)
+        for option in (1, 1, 1, 1):
+            store.record_answer(session, option, True)
+        await store.flush()
+        # Эти ответы не успевают записаться до сбоя
+        store.record_answer(session, 2, False)
+        store.record_answer(session, 2, False)
+
+        # Перезапуск: новое хранилище загружает тест из БД
+        restarted = ActiveSessionStore()
+        resumed = await restarted.get(6002)
+        return progress, resumed
+
+    progress, resumed = asyncio.run(scenario())
+    assert resumed.progress_id == progress.id
+    assert resumed.question_ids == QUESTION_IDS
+    assert (resumed.current_question, resumed.correct_answers) == (4, 4)
+    assert resumed.current_question_id == QUESTION_IDS[4]
+    assert resumed.pending_answers == []
+
+
+def test_stale_batch_does_not_touch_finished_session():
+    async def scenario():
+        store = ActiveSessionStore()
+        progress = await create_progress(6003)
+        session = store.start(progress, QUESTION_IDS)
+        store.record_answer(session, 1, True)
+        # Пачка, снятая до завершения теста и записанная после него
+        stale_rows = [session.progress_row()]
+
+        store.record_answer(session, 1, True)
+        async with AsyncSessionLocal() as db:
+            await store.finish(db, session)
+            await db.commit()
+        assert await store.flush() == 0  # завершенный тест убран из памяти
+
+        async with AsyncSessionLocal() as db:
+            await store._write(db, stale_rows, [])
+            await db.commit()
+        return await stored_state(progress.id)
+
+    progress, answers = asyncio.run(scenario())
+    assert not progress.is_testing
+    assert progress.current_question == 2
+    assert answers[:2] == [1, 1]
+
+
+def test_flush_does_not_write_into_replaced_session():
+    async def scenario():
+        store = ActiveSessionStore()
+        old = await create_progress(6004)
+        session = store.start(old, QUESTION_IDS)
+        store.record_answer(session, 3, False)
+
+        # Новый тест заменяет прогресс, пока фоновая запись ждет блокировку
+        async with AsyncSessionLocal() as db, write_transaction(db):
+            flush = asyncio.create_task(store.flush())
+            await asyncio.sleep(0.05)
+            store.discard(6004)
+            await db.delete(await db.get(UserProgress, old.id))
+            await db.flush()
+            new = UserProgress(user_id=6004, level="junior_python", is_testing=True)
+            db.add(new)
+        assert await flush == 0
+        return new, await stored_state(new.id)
+
+    new, (progress, _) = asyncio.run(scenario())
+    assert (progress.current_question, progress.correct_answers) == (0, 0)
+    assert progress.is_testing
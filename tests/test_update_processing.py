@@ -0,0 +1,93 @@
+"""PerUserUpdateProcessor: порядок обновлений пользователя и общий лимит."""
+
+import asyncio
+import random
+import time
+
+from telegram import CallbackQuery, Update, User
+
+from update_processing import PerUserUpdateProcessor
+
+
+def make_update(update_id, user_id, position):
+    query = CallbackQuery(
+        id=str(update_id),
+        from_user=User(user_id, f"user{user_id}", False),
+        chat_instance=str(user_id),
+        data=f"answer_{position}",
+    )
+    return Update(update_id, callback_query=query)
+
+
+async def dispatch(processor, updates, handler):
+    """Раздает обновления, как Application при concurrent_updates"""
+    async with processor:
+        tasks = [
+            asyncio.create_task(processor.process_update(update, handler(update)))
+            for update in updates
+        ]
+        await asyncio.gather(*tasks)
+
+
+def test_updates_of_one_user_are_applied_in_order():
+    rng = random.Random(1)
+    updates = [
+        make_update(position * 10 + user_id, user_id, position)
+        for position in range(10)
+        for user_id in range(1, 11)
+    ]
+    applied = {}
+
+    async def handler(update):
+        await asyncio.sleep(rng.uniform(0, 0.005))
+        position = int(update.callback_query.data.split("_")[1])
+        applied.setdefault(update.effective_user.id, []).append(position)
+
+    processor = PerUserUpdateProcessor(8)
+    asyncio.run(dispatch(processor, updates, handler))
+
+    assert applied == {user_id: list(range(10)) for user_id in range(1, 11)}
+    assert len(processor) == 0
+
+
+def test_busy_user_does_not_block_other_users():
+    # Первый пользователь присылает 20 обновлений подряд, второй - одно после них
+    updates = [make_update(i, 1, i) for i in range(20)] + [make_update(100, 2, 0)]
+    finished = {}
+
+    async def handler(update):
+        await asyncio.sleep(0.05)
+        finished[update.update_id] = time.perf_counter()
+
+    started = time.perf_counter()
+    asyncio.run(dispatch(PerUserUpdateProcessor(8), updates, handler))
+
+    # Обновление второго пользователя не ждет очереди первого
+    assert finished[100] - started < 0.2
+    assert finished[19] - started >= 20 * 0.05
+
+
+def test_concurrency_scales_with_users_within_limit():
+    limit = 8
+    running = 0
+    peak = 0
+    updates = [
+        make_update(position * 100 + user_id, user_id, position)
+        for position in range(5)
+        for user_id in range(1, 33)
+    ]
+
+    async def handler(update):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    started = time.perf_counter()
+    asyncio.run(dispatch(PerUserUpdateProcessor(limit), updates, handler))
+    elapsed = time.perf_counter() - started
+
+    assert peak == limit
+    # 160 обновлений по 10 мс: последовательно 1.6 с, параллельно по 8 - 0.2 с
+    assert elapsed < 0.8
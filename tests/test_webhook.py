@@ -0,0 +1,126 @@
+"""Режим webhook: бот принимает обновления по HTTP от локального клиента."""
+
+import asyncio
+import json
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+from sqlalchemy import select
+
+import bot
+from database import AsyncSessionLocal, UserStats
+from fake_bot_api import FakeBotAPI, UpdateFactory
+
+SECRET = "s3cret"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def post(port, update, secret=SECRET):
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{port}/hook",
+        data=json.dumps(update).encode("utf-8"),
+        headers={
+            "Content-Type": "application/json",
+            "X-Telegram-Bot-Api-Secret-Token": secret,
+        },
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def wait_for(condition, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_webhook_end_to_end(monkeypatch):
+    port = free_port()
+    monkeypatch.setattr(bot, "BOT_MODE", "webhook")
+    monkeypatch.setattr(bot, "WEBHOOK_LISTEN", "127.0.0.1")
+    monkeypatch.setattr(bot, "WEBHOOK_PORT", port)
+    monkeypatch.setattr(bot, "WEBHOOK_PATH", "hook")
+    monkeypatch.setattr(bot, "WEBHOOK_URL", "https://example.test/hook")
+    monkeypatch.setattr(bot, "WEBHOOK_SECRET_TOKEN", SECRET)
+    monkeypatch.setattr(bot, "COMPACT_SESSION_MODE", False)
+    bot.question_bank.load()
+    bot.leaderboard.load()
+
+    user_id = 9001
+    api = FakeBotAPI()
+    factory = UpdateFactory()
+    application = bot.build_application(request=api)
+    running = {}
+
+    async def remember_loop(context):
+        running["loop"] = asyncio.get_running_loop()
+
+    application.job_queue.run_once(remember_loop, 0)
+
+    def finished():
+        return any(
+            method == "sendMessage" and "Выберите дальнейшее" in params.get("text", "")
+            for method, params in list(api.requests)
+        )
+
+    def client():
+        try:
+            assert wait_for(lambda: "loop" in running)
+            running["bad_secret"] = post(
+                port, factory.command(user_id, "/start"), secret="wrong"
+            )
+            updates = [factory.command(user_id, "/start")]
+            updates.append(factory.callback(user_id, "level_python_junior"))
+            updates += [factory.callback(user_id, f"answer_{i}_{i % 4 + 1}") for i in range(10)]
+            running["statuses"] = [post(port, update) for update in updates]
+            running["finished"] = wait_for(finished)
+        finally:
+            running["loop"].call_soon_threadsafe(application.stop_running)
+
+    thread = threading.Thread(target=client, daemon=True)
+    thread.start()
+    # run_webhook работает в текущем event loop потока и закрывает его
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    bot.run_application(application)
+    thread.join(5)
+
+    assert running["bad_secret"] == 403
+    assert running["statuses"] == [200] * 12
+    assert running["finished"]
+    webhooks = [params for method, params in api.requests if method == "setWebhook"]
+    assert webhooks[0]["url"] == "https://example.test/hook"
+    assert webhooks[0]["secret_token"] == SECRET
+
+    async def stats():
+        async with AsyncSessionLocal() as db:
+            return await db.scalar(select(UserStats).where(UserStats.user_id == user_id))
+
+    assert asyncio.run(stats()).total_tests_python == 1
+
+
+@pytest.mark.parametrize(
+    "mode, url",
+    [("webhook", None), ("webhook", ""), ("longpoll", None)],
+)
+def test_invalid_mode_fails_before_start(monkeypatch, mode, url):
+    monkeypatch.setattr(bot, "BOT_MODE", mode)
+    monkeypatch.setattr(bot, "WEBHOOK_URL", url)
+    application = bot.build_application(request=FakeBotAPI())
+    with pytest.raises(ValueError):
+        bot.run_application(application)
+    assert not application.running
@@ -0,0 +1,135 @@
+"""Параллельная обработка обновлений с сохранением порядка для каждого пользователя.
+
+Обновления разных пользователей обрабатываются одновременно (не больше
+MAX_CONCURRENT_UPDATES), а обновления одного пользователя - строго по
+очереди и в порядке поступления: перед обработкой берется блокировка
+пользователя. Очередь ожидания asyncio.Lock и asyncio.Semaphore работают по
+принципу FIFO, а задачи обновлений создаются в порядке получения, поэтому
+ответы на вопросы применяются в том порядке, в котором пользователь нажал
+кнопки. Это же делает безопасным ConversationHandler создания теста:
+его состояние хранится по пользователю, и обновления одного пользователя
+не пересекаются.
+
+Общий слот (один из MAX_CONCURRENT_UPDATES) занимается только после того,
+как подошла очередь пользователя: обновления, ждущие своей очереди, не
+занимают слоты и не задерживают других пользователей.
+
+Обновления без пользователя и чата (например, опросы каналов)
+обрабатываются без блокировки.
+
+iter_handlers перечисляет все зарегистрированные обработчики, а
+wrap_handler_callbacks оборачивает их callback (метрики, аудит запросов к БД).
+"""
+
+import asyncio
+import os
+import sys
+
+from telegram import Update
+from telegram.ext import (
+    BaseUpdateProcessor,
+    CallbackQueryHandler,
+    CommandHandler,
+    ConversationHandler,
+)
+
+# Сколько обновлений обрабатывается одновременно
+MAX_CONCURRENT_UPDATES = int(os.getenv("MAX_CONCURRENT_UPDATES", "64"))
+
+# Лимит для семафора BaseUpdateProcessor: настоящий лимит соблюдается
+# в PerUserUpdateProcessor.do_process_update
+UNLIMITED_UPDATES = sys.maxsize
+
+
+def update_owner(update):
+    """Ключ, по которому обновления выполняются по очереди (user_id или chat_id)"""
+    if not isinstance(update, Update):
+        return None
+    if update.effective_user is not None:
+        return update.effective_user.id
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    return None
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Обработчик обновлений: параллельно по пользователям, по очереди внутри пользователя"""
+
+    __slots__ = ("_limit", "_locks")
+
+    def __init__(self, max_concurrent_updates=MAX_CONCURRENT_UPDATES):
+        # BaseUpdateProcessor.process_update занимает слот своего семафора до
+        # вызова do_process_update. С настоящим лимитом обновления одного
+        # пользователя, ждущие своей очереди, держали бы общие слоты и один
+        # активный пользователь задерживал бы всех остальных. Поэтому базовому
+        # классу передается лимит, который не достигается, а общий слот
+        # берется в do_process_update после блокировки пользователя.
+        super().__init__(UNLIMITED_UPDATES)
+        self._limit = asyncio.Semaphore(max_concurrent_updates)
+        # owner -> [блокировка, число обновлений, которые ее держат или ждут]
+        self._locks = {}
+
+    def __len__(self):
+        """Число пользователей, у которых есть обновления в обработке"""
+        return len(self._locks)
+
+    async def do_process_update(self, update, coroutine):
+        owner = update_owner(update)
+        if owner is None:
+            async with self._limit:
+                await coroutine
+            return
+
+        entry = self._locks.get(owner)
+        if entry is None:
+            entry = self._locks[owner] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                async with self._limit:
+                    await coroutine
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[owner]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+
+def _iter_handlers(handlers):
+    for handler in handlers:
+        if isinstance(handler, ConversationHandler):
+            yield from _iter_handlers(handler.entry_points)
+            for state_handlers in handler.states.values():
+                yield from _iter_handlers(state_handlers)
+            yield from _iter_handlers(handler.fallbacks)
+        else:
+            yield handler
+
+
+def handler_pattern(handler):
+    """Чем срабатывает обработчик: шаблон callback_data, команды или тип"""
+    if isinstance(handler, CallbackQueryHandler) and handler.pattern is not None:
+        return getattr(handler.pattern, "pattern", str(handler.pattern))
+    if isinstance(handler, CommandHandler):
+        return " ".join(f"/{command}" for command in sorted(handler.commands))
+    return type(handler).__name__
+
+
+def iter_handlers(application):
+    """Все обработчики приложения, включая вложенные в ConversationHandler"""
+    for group_handlers in application.handlers.values():
+        yield from _iter_handlers(group_handlers)
+
+
+def wrap_handler_callbacks(application, wrap):
+    """Заменяет callback каждого обработчика (и внутри ConversationHandler)
+    на wrap(callback, имя, шаблон). Вызывается после регистрации обработчиков.
+    """
+    for handler in iter_handlers(application):
+        name = getattr(handler.callback, "__name__", type(handler.callback).__name__)
+        handler.callback = wrap(handler.callback, name, handler_pattern(handler))